@@ -1,27 +1,41 @@
 from fastapi import FastAPI, APIRouter, HTTPException, File, UploadFile, Depends, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr, validator
-from typing import List, Optional
+from pydantic import BaseModel, Field, EmailStr, validator, model_validator
+from typing import List, Optional, Union
 import uuid
 from datetime import datetime, timezone, timedelta
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 import pandas as pd
+import openpyxl
 import PyPDF2
 import pdfplumber
 import io
 import tempfile
 import json
-import requests
-from bs4 import BeautifulSoup
+import hashlib
+import base64
+import copy
+import unicodedata
+from collections import OrderedDict
+import asyncio
+import functools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+import httpx
+from bs4 import BeautifulSoup, UnicodeDammit
 from newspaper import Article
 import time
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urlparse, urljoin, urlunparse, parse_qsl, urlencode
 import re
 from passlib.context import CryptContext
 from jose import JWTError, jwt
@@ -105,12 +119,42 @@ class FileUploadResponse(BaseModel):
     filename: str
     file_type: str
     total_entries: int
-    extracted_texts: List[dict]  # [{text: str, row_number: int, metadata: dict}]
+    extracted_texts: List[dict]  # [{text: str, row_number: int | str, metadata: dict}]; first rows only when truncated
+    truncated: bool = False  # True when extracted_texts is a preview of fewer than total_entries rows
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class BatchAnalysisRequest(BaseModel):
     file_id: str
-    texts: List[dict]  # [{text: str, row_number: int, metadata: dict}]
+    # Rows are read from the stored upload; these optionally narrow the selection
+    row_numbers: Optional[List[Union[int, str]]] = None
+    start: int = 0
+    limit: Optional[int] = None
+    texts: Optional[List[dict]] = None  # Deprecated: only the row_numbers are used
+    
+    @validator('start')
+    def validate_start(cls, v):
+        if v < 0:
+            raise ValueError('start must not be negative')
+        return v
+    
+    @validator('limit')
+    def validate_limit(cls, v):
+        if v is not None and v < 1:
+            raise ValueError('limit must be at least 1')
+        return v
+    
+    @model_validator(mode='before')
+    @classmethod
+    def select_rows_from_texts(cls, data):
+        # Older clients post the extracted rows back; never trust their text
+        if isinstance(data, dict) and data.get('texts') is not None:
+            data = dict(data)
+            if data.get('row_numbers') is None:
+                data['row_numbers'] = [
+                    entry.get('row_number') for entry in data['texts'] if isinstance(entry, dict)
+                ]
+            data['texts'] = None
+        return data
 
 class BatchAnalysisResponse(BaseModel):
     batch_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -167,6 +211,46 @@ class BatchURLResponse(BaseModel):
     processing_time: float
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class HistoryPage(BaseModel):
+    items: List[dict]
+    next_cursor: Optional[str] = None  # Pass back as ``cursor`` for the next page; None at the end
+
+class AnalyticsResponse(BaseModel):
+    granularity: str  # "hour" | "day"
+    start: datetime
+    end: datetime
+    total_analyses: int
+    sentiment_distribution: dict
+    dominant_emotion_distribution: dict
+    emotion_averages: dict
+    topic_distribution: dict
+    aspect_distribution: dict  # {aspect: {sentiment: count}}
+    sarcasm_detected: int
+    sources: dict  # {"text" | "url" | "batch": count}
+    series: List[dict]  # [{bucket_start, total, sentiment}] per bucket
+
+class BatchJobSubmitResponse(BaseModel):
+    job_id: str
+    job_type: str  # "texts" or "urls"
+    status: str  # queued, running, completed, failed
+    total_items: int
+    created_at: datetime
+
+class BatchJobStatus(BaseModel):
+    job_id: str
+    job_type: str
+    status: str
+    total_items: int
+    completed_items: int = 0
+    failed_items: int = 0
+    partial_results: List[dict] = []  # One page of finished items, in item order
+    failed_urls: List[dict] = []  # [{url: str, error: str}] for URL jobs
+    batch_id: Optional[str] = None  # Set once the job completes
+    result: Optional[dict] = None  # Final BatchAnalysisResponse/BatchURLResponse; results holds the requested page
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
 # User Authentication Models
 class UserCreate(BaseModel):
     email: EmailStr
@@ -238,15 +322,321 @@ class PasswordReset(BaseModel):
         return v
 
 
+# Extraction Pool
+EXTRACTION_POOL_WORKERS = int(os.getenv("EXTRACTION_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXTRACTION_POOL_MAX_QUEUE = int(os.getenv("EXTRACTION_POOL_MAX_QUEUE", "64"))
+
+class ExtractionPool:
+    """Bounded process pool that keeps CPU-heavy HTML/PDF parsing off the event loop"""
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.executor = None
+        self._slots = asyncio.Semaphore(max_workers)
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self.executor
+
+    async def run(self, fn, *args):
+        """Run fn(*args) in a worker process once one is free"""
+        if self.queued >= self.max_queue:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy processing other documents. Please try again shortly."
+            )
+
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+
+        self.active += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), functools.partial(fn, *args))
+            self.completed += 1
+            return result
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for subsequent jobs
+            self.failed += 1
+            self.executor = None
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.active -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        """Queue depth and worker utilization, for sizing the pool"""
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": self.queued,
+            "utilization": self.active / self.max_workers if self.max_workers else 0.0,
+            "completed": self.completed,
+            "failed": self.failed
+        }
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+extraction_pool = ExtractionPool(EXTRACTION_POOL_WORKERS, EXTRACTION_POOL_MAX_QUEUE)
+
+# HTML extractors (module level so they can run in the extraction pool)
+def extract_html_with_newspaper(url: str, content: bytes, charset: Optional[str] = None) -> dict:
+    """Extract content using newspaper3k library from already downloaded bytes"""
+    try:
+        # Decoded here rather than on the event loop: without a declared charset,
+        # UnicodeDammit runs charset detection over the whole body
+        html = UnicodeDammit(content, known_definite_encodings=[charset] if charset else []).unicode_markup or ''
+        article = Article(url)
+        article.set_html(html)
+        article.parse()
+        
+        return {
+            'title': article.title or '',
+            'text': article.text or '',
+            'authors': article.authors,
+            'publish_date': article.publish_date.isoformat() if article.publish_date else None,
+            'top_image': article.top_image or '',
+            'meta_keywords': article.meta_keywords,
+            'meta_description': article.meta_description or '',
+            'canonical_link': article.canonical_link or url,
+            'method': 'newspaper3k'
+        }
+    except Exception as e:
+        logger.warning(f"Newspaper3k extraction failed for {url}: {e}")
+        return None
+
+def extract_html_with_beautifulsoup(url: str, content: bytes) -> dict:
+    """Extract content using BeautifulSoup as fallback, from already downloaded bytes"""
+    try:
+        soup = BeautifulSoup(content, 'html.parser')
+        
+        # Remove script and style elements
+        for script in soup(["script", "style", "nav", "header", "footer", "aside"]):
+            script.decompose()
+        
+        # Extract title
+        title = ''
+        if soup.title:
+            title = soup.title.string.strip()
+        elif soup.find('h1'):
+            title = soup.find('h1').get_text().strip()
+        
+        # Extract main content
+        content_selectors = [
+            'article', 'main', '.content', '.post-content', 
+            '.entry-content', '.article-body', '#content'
+        ]
+        
+        main_content = None
+        for selector in content_selectors:
+            main_content = soup.select_one(selector)
+            if main_content:
+                break
+        
+        if not main_content:
+            main_content = soup.find('body')
+        
+        if main_content:
+            # Clean up the text
+            text = main_content.get_text(separator=' ', strip=True)
+            # Remove extra whitespace
+            text = re.sub(r'\s+', ' ', text).strip()
+        else:
+            text = soup.get_text(separator=' ', strip=True)
+            text = re.sub(r'\s+', ' ', text).strip()
+        
+        # Extract meta information
+        meta_description = ''
+        meta_desc = soup.find('meta', attrs={'name': 'description'})
+        if meta_desc:
+            meta_description = meta_desc.get('content', '')
+        
+        author = ''
+        author_meta = soup.find('meta', attrs={'name': 'author'})
+        if author_meta:
+            author = author_meta.get('content', '')
+        
+        return {
+            'title': title,
+            'text': text,
+            'authors': [author] if author else [],
+            'publish_date': None,
+            'top_image': '',
+            'meta_keywords': [],
+            'meta_description': meta_description,
+            'canonical_link': url,
+            'method': 'beautifulsoup'
+        }
+        
+    except Exception as e:
+        logger.error(f"BeautifulSoup extraction failed for {url}: {e}")
+        return None
+
+# URL Content Cache
+URL_CACHE_FRESH_SECONDS = int(os.getenv("URL_CACHE_FRESH_SECONDS", "600"))
+URL_CACHE_TTL_SECONDS = int(os.getenv("URL_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+class URLContentCache:
+    """MongoDB cache of extracted URL content, validators and the last sentiment result"""
+
+    def __init__(self, collection, fresh_seconds: int, ttl_seconds: int):
+        self.collection = collection
+        self.fresh_seconds = fresh_seconds
+        self.ttl_seconds = ttl_seconds
+
+    async def ensure_indexes(self):
+        """Create the TTL index that evicts entries not revalidated recently"""
+        await self.collection.create_index("validated_at", expireAfterSeconds=self.ttl_seconds)
+
+    def is_fresh(self, entry: dict) -> bool:
+        """Whether an entry is recent enough to use without revalidating"""
+        validated_at = entry.get("validated_at")
+        if not validated_at:
+            return False
+        if validated_at.tzinfo is None:
+            validated_at = validated_at.replace(tzinfo=timezone.utc)
+        return (datetime.now(timezone.utc) - validated_at).total_seconds() < self.fresh_seconds
+
+    async def get(self, key: str) -> Optional[dict]:
+        try:
+            return await self.collection.find_one({"_id": key})
+        except Exception as e:
+            logger.warning(f"URL cache lookup failed for {key}: {e}")
+            return None
+
+    async def store(self, key: str, url: str, page: dict, extracted_data: dict, content_hash: str):
+        """Store freshly extracted content together with its HTTP validators"""
+        now = datetime.now(timezone.utc)
+        try:
+            await self.collection.update_one(
+                {"_id": key},
+                {"$set": {
+                    "url": url,
+                    "extracted": extracted_data,
+                    "content_hash": content_hash,
+                    "etag": page.get("etag"),
+                    "last_modified": page.get("last_modified"),
+                    "status_code": page.get("status_code"),
+                    "final_url": page.get("final_url"),
+                    "content_type": page.get("content_type"),
+                    "fetched_at": now,
+                    "validated_at": now
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"URL cache write failed for {key}: {e}")
+
+    async def touch(self, key: str):
+        """Record a successful revalidation (304 Not Modified)"""
+        try:
+            await self.collection.update_one(
+                {"_id": key},
+                {"$set": {"validated_at": datetime.now(timezone.utc)}}
+            )
+        except Exception as e:
+            logger.warning(f"URL cache update failed for {key}: {e}")
+
+    async def store_analysis(self, key: str, content_hash: str, prompt_version: str, result: dict):
+        """Attach a sentiment result to the cached content it was computed from"""
+        try:
+            await self.collection.update_one(
+                {"_id": key, "content_hash": content_hash},
+                {"$set": {"analysis": {
+                    "content_hash": content_hash,
+                    "prompt_version": prompt_version,
+                    "result": result
+                }}}
+            )
+        except Exception as e:
+            logger.warning(f"URL cache analysis write failed for {key}: {e}")
+
+url_content_cache = URLContentCache(
+    db.url_cache,
+    fresh_seconds=URL_CACHE_FRESH_SECONDS,
+    ttl_seconds=URL_CACHE_TTL_SECONDS
+)
+
 # URL Processing Service
 class URLProcessor:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
-        self.timeout = 30
+    def __init__(self, cache: URLContentCache):
+        self.cache = cache
+        self.timeout = httpx.Timeout(30.0, connect=10.0)
         self.max_content_length = 10 * 1024 * 1024  # 10MB limit
+        self.chunk_size = 64 * 1024
+        self.allowed_content_types = ('text/html', 'application/xhtml+xml')
+        # One pooled client shared by all requests; connections are kept alive per host
+        self.client = httpx.AsyncClient(
+            headers={
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            },
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0),
+            follow_redirects=True
+        )
+    
+    async def close(self):
+        """Close the pooled HTTP client"""
+        await self.client.aclose()
+    
+    async def fetch_page(self, url: str, headers: Optional[dict] = None) -> dict:
+        """Download a page once; the body and fetch metadata are shared by all extractors.
+
+        The body is streamed so oversized or non-HTML responses are rejected
+        before (or while) it is read rather than after. A conditional request
+        answered with 304 returns no body and ``not_modified`` set.
+        """
+        async with self.client.stream("GET", url, headers=headers) as response:
+            # Checked before raise_for_status, which treats a 304 as an error
+            if response.status_code == 304:
+                return {'not_modified': True, 'status_code': 304}
+            
+            response.raise_for_status()
+            
+            content_type = response.headers.get('content-type', '')
+            mime_type = content_type.split(';')[0].strip().lower()
+            if mime_type and mime_type not in self.allowed_content_types:
+                raise HTTPException(status_code=415, detail=f"Unsupported content type: {mime_type}")
+            
+            declared_length = response.headers.get('content-length')
+            if declared_length and declared_length.isdigit() and int(declared_length) > self.max_content_length:
+                raise HTTPException(status_code=413, detail=f"Content too large: {declared_length} bytes")
+            
+            buffer = bytearray()
+            async for chunk in response.aiter_bytes(self.chunk_size):
+                buffer.extend(chunk)
+                if len(buffer) > self.max_content_length:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Content too large: exceeds {self.max_content_length} bytes"
+                    )
+            
+            return {
+                'content': bytes(buffer),
+                'charset': response.charset_encoding,
+                'status_code': response.status_code,
+                'final_url': str(response.url),
+                'content_type': content_type,
+                'etag': response.headers.get('etag'),
+                'last_modified': response.headers.get('last-modified'),
+                'not_modified': False
+            }
     
     def validate_url(self, url: str) -> tuple[bool, str]:
         """Validate URL format and accessibility"""
@@ -262,101 +652,76 @@ class URLProcessor:
         except Exception as e:
             return False, f"URL validation error: {str(e)}"
     
-    def extract_with_newspaper(self, url: str) -> dict:
-        """Extract content using newspaper3k library"""
-        try:
-            article = Article(url)
-            article.download()
-            article.parse()
-            
-            return {
-                'title': article.title or '',
-                'text': article.text or '',
-                'authors': article.authors,
-                'publish_date': article.publish_date.isoformat() if article.publish_date else None,
-                'top_image': article.top_image or '',
-                'meta_keywords': article.meta_keywords,
-                'meta_description': article.meta_description or '',
-                'canonical_link': article.canonical_link or url,
-                'method': 'newspaper3k'
-            }
-        except Exception as e:
-            logger.warning(f"Newspaper3k extraction failed for {url}: {e}")
-            return None
+    def normalize_url(self, url: str) -> str:
+        """Canonical form of a URL used as the content cache key"""
+        parsed = urlparse(url.strip())
+        scheme = parsed.scheme.lower()
+        netloc = parsed.netloc.lower()
+        if (scheme == 'http' and netloc.endswith(':80')) or (scheme == 'https' and netloc.endswith(':443')):
+            netloc = netloc.rsplit(':', 1)[0]
+        query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+        return urlunparse((scheme, netloc, parsed.path or '/', parsed.params, query, ''))
     
-    def extract_with_beautifulsoup(self, url: str) -> dict:
-        """Extract content using BeautifulSoup as fallback"""
-        try:
-            response = self.session.get(url, timeout=self.timeout)
-            response.raise_for_status()
-            
-            # Check content length
-            if len(response.content) > self.max_content_length:
-                raise Exception(f"Content too large: {len(response.content)} bytes")
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style", "nav", "header", "footer", "aside"]):
-                script.decompose()
-            
-            # Extract title
-            title = ''
-            if soup.title:
-                title = soup.title.string.strip()
-            elif soup.find('h1'):
-                title = soup.find('h1').get_text().strip()
-            
-            # Extract main content
-            content_selectors = [
-                'article', 'main', '.content', '.post-content', 
-                '.entry-content', '.article-body', '#content'
-            ]
-            
-            main_content = None
-            for selector in content_selectors:
-                main_content = soup.select_one(selector)
-                if main_content:
-                    break
-            
-            if not main_content:
-                main_content = soup.find('body')
-            
-            if main_content:
-                # Clean up the text
-                text = main_content.get_text(separator=' ', strip=True)
-                # Remove extra whitespace
-                text = re.sub(r'\s+', ' ', text).strip()
-            else:
-                text = soup.get_text(separator=' ', strip=True)
-                text = re.sub(r'\s+', ' ', text).strip()
-            
-            # Extract meta information
-            meta_description = ''
-            meta_desc = soup.find('meta', attrs={'name': 'description'})
-            if meta_desc:
-                meta_description = meta_desc.get('content', '')
-            
-            author = ''
-            author_meta = soup.find('meta', attrs={'name': 'author'})
-            if author_meta:
-                author = author_meta.get('content', '')
-            
-            return {
-                'title': title,
-                'text': text,
-                'authors': [author] if author else [],
-                'publish_date': None,
-                'top_image': '',
-                'meta_keywords': [],
-                'meta_description': meta_description,
-                'canonical_link': url,
-                'method': 'beautifulsoup'
+    async def load_content(self, url: str, cache_key: str) -> tuple[dict, dict, Optional[dict]]:
+        """Return (extracted_data, page_info, cached_analysis) for a URL.
+
+        Cached content is used as-is while fresh and revalidated with a
+        conditional GET afterwards; the page is only re-downloaded and
+        re-parsed when the server reports a change.
+        """
+        entry = await self.cache.get(cache_key)
+        cached_page = None
+        if entry:
+            cached_page = {
+                'status_code': entry.get('status_code'),
+                'final_url': entry.get('final_url'),
+                'content_type': entry.get('content_type')
             }
-            
+            if self.cache.is_fresh(entry):
+                return entry['extracted'], cached_page, entry
+        
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        
+        # Download the page once for both extractors
+        try:
+            page = await self.fetch_page(url, headers=headers or None)
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"BeautifulSoup extraction failed for {url}: {e}")
-            return None
+            logger.error(f"Download failed for {url}: {e}")
+            raise HTTPException(status_code=500, detail="Failed to extract content from URL")
+        
+        if page['not_modified'] and entry:
+            await self.cache.touch(cache_key)
+            return entry['extracted'], cached_page, entry
+        
+        # Try newspaper3k first (better for articles)
+        extracted_data = await self.extract_with_newspaper(url, page['content'], page['charset'])
+        
+        # Fallback to BeautifulSoup if newspaper3k fails
+        if not extracted_data or not extracted_data.get('text'):
+            extracted_data = await self.extract_with_beautifulsoup(url, page['content'])
+        
+        if extracted_data and extracted_data.get('text'):
+            content_hash = hashlib.sha256(extracted_data['text'].encode('utf-8')).hexdigest()
+            await self.cache.store(cache_key, url, page, extracted_data, content_hash)
+            # Keep a previous analysis only if the text it was computed from is unchanged
+            if entry and entry.get('content_hash') == content_hash:
+                return extracted_data, page, entry
+        
+        return extracted_data, page, None
+    
+    async def extract_with_newspaper(self, url: str, content: bytes, charset: Optional[str] = None) -> dict:
+        """Extract content using newspaper3k library in the extraction pool"""
+        return await extraction_pool.run(extract_html_with_newspaper, url, content, charset)
+    
+    async def extract_with_beautifulsoup(self, url: str, content: bytes) -> dict:
+        """Extract content using BeautifulSoup in the extraction pool"""
+        return await extraction_pool.run(extract_html_with_beautifulsoup, url, content)
     
     async def process_url(self, url: str, extract_full_content: bool = True, include_metadata: bool = True) -> dict:
         """Process a single URL and extract content"""
@@ -367,12 +732,8 @@ class URLProcessor:
         if not is_valid:
             raise HTTPException(status_code=400, detail=error_msg)
         
-        # Try newspaper3k first (better for articles)
-        extracted_data = self.extract_with_newspaper(url)
-        
-        # Fallback to BeautifulSoup if newspaper3k fails
-        if not extracted_data or not extracted_data.get('text'):
-            extracted_data = self.extract_with_beautifulsoup(url)
+        cache_key = self.normalize_url(url)
+        extracted_data, page, cache_entry = await self.load_content(url, cache_key)
         
         if not extracted_data:
             raise HTTPException(status_code=500, detail="Failed to extract content from URL")
@@ -394,7 +755,10 @@ class URLProcessor:
             'publish_date': extracted_data.get('publish_date'),
             'extracted_text': text_content,
             'text_length': len(text_content),
-            'processing_time': processing_time
+            'processing_time': processing_time,
+            'cache_key': cache_key,
+            'content_hash': hashlib.sha256(extracted_data.get('text', '').encode('utf-8')).hexdigest(),
+            'cached_analysis': (cache_entry or {}).get('analysis')
         }
         
         if include_metadata:
@@ -406,13 +770,16 @@ class URLProcessor:
                 'canonical_link': extracted_data.get('canonical_link', url),
                 'domain': urlparse(url).netloc,
                 'word_count': len(text_content.split()),
-                'character_count': len(text_content)
+                'character_count': len(text_content),
+                'http_status': page['status_code'],
+                'final_url': page['final_url'],
+                'content_type': page['content_type']
             }
         
         return result
 
 # Initialize URL processor
-url_processor = URLProcessor()
+url_processor = URLProcessor(url_content_cache)
 
 # Authentication Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
@@ -429,7 +796,20 @@ FROM_EMAIL = os.getenv("FROM_EMAIL")
 FRONTEND_URL = os.getenv("FRONTEND_URL", "https://neon-effect-fix.preview.emergentagent.com")
 
 # Security utilities
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+
+# Hashes made with a different cost factor are flagged for rehash on login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
+# bcrypt releases the GIL, so a small dedicated thread pool keeps it off the
+# event loop; its size caps how many hashes run at once
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 # Email template engine
@@ -521,13 +901,22 @@ email_templates = {
 template_env = Environment(loader=DictLoader(email_templates))
 
 # Authentication Utilities
-def hash_password(password: str) -> str:
+async def hash_password(password: str) -> str:
     """Hash a password using BCrypt algorithm."""
-    return pwd_context.hash(password)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, pwd_context.hash, password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, pwd_context.verify, plain_password, hashed_password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """Verify a password and return a replacement hash if the stored one is outdated."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_executor, pwd_context.verify_and_update, plain_password, hashed_password
+    )
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token with expiration."""
@@ -646,6 +1035,54 @@ class TokenService:
 email_service = EmailService()
 token_service = TokenService()
 
+# Authenticated User Cache
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+
+class UserCache:
+    """Short-lived, size-bounded cache of user documents keyed by token subject (email).
+
+    Entries are invalidated explicitly whenever this process changes a user
+    document; the TTL bounds staleness for changes made by other processes.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # email -> (expires_at, user)
+        self._emails_by_id = {}
+
+    def get(self, email: str) -> Optional[dict]:
+        entry = self._entries.get(email)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if time.monotonic() >= expires_at:
+            self.invalidate(email=email)
+            return None
+        self._entries.move_to_end(email)
+        return copy.deepcopy(user)
+
+    def set(self, email: str, user: dict):
+        self._entries[email] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(user))
+        self._entries.move_to_end(email)
+        self._emails_by_id[user["id"]] = email
+        while len(self._entries) > self.max_size:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._emails_by_id.pop(evicted["id"], None)
+
+    def invalidate(self, user_id: Optional[str] = None, email: Optional[str] = None):
+        """Drop a user's entry by id and/or email"""
+        if user_id is not None and email is None:
+            email = self._emails_by_id.get(user_id)
+        if email is None:
+            return
+        entry = self._entries.pop(email, None)
+        if entry is not None:
+            self._emails_by_id.pop(entry[1]["id"], None)
+
+user_cache = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
+
 # User Management Functions
 async def get_user_by_email(email: str):
     """Get user by email from database."""
@@ -668,7 +1105,7 @@ async def create_user(user_data: UserCreate):
         )
     
     # Hash password and create user
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hash_password(user_data.password)
     
     # All accounts are automatically active and verified
     user_doc = {
@@ -716,8 +1153,18 @@ async def create_user(user_data: UserCreate):
 async def authenticate_user(email: str, password: str):
     """Authenticate user credentials and return user if valid."""
     user = await get_user_by_email(email)
-    if not user or not verify_password(password, user["hashed_password"]):
+    if not user:
+        return False
+    
+    is_valid, new_hash = await verify_and_update_password(password, user["hashed_password"])
+    if not is_valid:
         return False
+    
+    # Opportunistically upgrade hashes made with an old cost factor
+    if new_hash:
+        await db.users.update_one({"id": user["id"]}, {"$set": {"hashed_password": new_hash}})
+        user_cache.invalidate(user_id=user["id"], email=user["email"])
+        user["hashed_password"] = new_hash
     return user
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
@@ -725,12 +1172,16 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     payload = await verify_token(token)
     email = payload.get("sub")
     
-    user = await get_user_by_email(email)
+    # Serve the hot path from the user cache; fall back to the database
+    user = user_cache.get(email)
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
-        )
+        user = await get_user_by_email(email)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found"
+            )
+        user_cache.set(email, user)
     
     return user
 
@@ -749,233 +1200,511 @@ async def get_current_verified_user(current_user = Depends(get_current_active_us
     return current_user
 
 # Usage Tracking
-async def check_usage_limits(user: dict, operation: str) -> bool:
-    """Check if user is within usage limits for the operation."""
-    usage_stats = user.get("usage_stats", {})
-    subscription_tier = user.get("subscription_tier", "free")
-    
-    # Define limits per tier
-    limits = {
-        "free": {
-            "analyses_this_month": 50,
-            "files_uploaded": 5,
-            "urls_analyzed": 10
-        },
-        "pro": {
-            "analyses_this_month": 10000,
-            "files_uploaded": 1000,
-            "urls_analyzed": 5000
-        }
+# Monthly limits per subscription tier
+USAGE_LIMITS = {
+    "free": {
+        "analyses_this_month": 50,
+        "files_uploaded": 5,
+        "urls_analyzed": 10
+    },
+    "pro": {
+        "analyses_this_month": 10000,
+        "files_uploaded": 1000,
+        "urls_analyzed": 5000
     }
+}
+
+def get_usage_limit(user: dict, operation: str) -> int:
+    """Monthly limit for an operation under the user's subscription tier."""
+    tier_limits = USAGE_LIMITS.get(user.get("subscription_tier", "free"), USAGE_LIMITS["free"])
+    return tier_limits.get(operation, 0)
+
+class UsageReservation:
+    """Quota units reserved before work starts; unused units are refunded by settle()."""
     
-    tier_limits = limits.get(subscription_tier, limits["free"])
-    current_usage = usage_stats.get(operation, 0)
-    limit = tier_limits.get(operation, 0)
+    def __init__(self, user_id: str, operation: str, amount: int):
+        self.user_id = user_id
+        self.operation = operation
+        self.amount = amount
+        self.used = 0
+        self.settled = False
     
-    return current_usage < limit
+    def use(self, amount: int = 1):
+        """Mark reserved units as consumed by completed work."""
+        self.used = min(self.amount, self.used + amount)
+    
+    async def settle(self):
+        """Refund whatever was reserved but not used (safe to call more than once)."""
+        if self.settled:
+            return
+        self.settled = True
+        unused = self.amount - self.used
+        if unused > 0:
+            await db.users.update_one(
+                {"id": self.user_id},
+                {"$inc": {f"usage_stats.{self.operation}": -unused}}
+            )
+            user_cache.invalidate(user_id=self.user_id)
 
-async def increment_usage(user_id: str, operation: str, amount: int = 1):
-    """Increment usage counter for user."""
-    await db.users.update_one(
-        {"id": user_id},
-        {"$inc": {f"usage_stats.{operation}": amount}}
+async def reserve_usage(user: dict, operation: str, amount: int = 1) -> Optional[UsageReservation]:
+    """Atomically reserve quota units, or return None if they would exceed the limit."""
+    limit = get_usage_limit(user, operation)
+    if amount > limit:
+        return None
+    
+    field = f"usage_stats.{operation}"
+    updated = await db.users.find_one_and_update(
+        {
+            "id": user["id"],
+            "$or": [{field: {"$lte": limit - amount}}, {field: {"$exists": False}}]
+        },
+        {"$inc": {field: amount}},
+        projection={"_id": 1},
+        return_document=ReturnDocument.AFTER
     )
+    if updated is None:
+        return None
+    
+    user_cache.invalidate(user_id=user["id"])
+    return UsageReservation(user["id"], operation, amount)
+
+async def get_remaining_usage(user: dict, operation: str) -> int:
+    """Units of an operation the user can still consume this month."""
+    fresh_user = await db.users.find_one({"id": user["id"]}, {"usage_stats": 1})
+    current_usage = ((fresh_user or {}).get("usage_stats") or {}).get(operation, 0)
+    return max(0, get_usage_limit(user, operation) - current_usage)
 
 # File Processing Utilities
-async def extract_text_from_file(file: UploadFile) -> List[dict]:
-    """Extract text from uploaded files based on file type"""
-    file_extension = file.filename.split('.')[-1].lower()
+def split_pdfplumber_paragraphs(text_content: str) -> List[Optional[str]]:
+    """Split pdfplumber page text into paragraphs; short ones are None to keep numbering"""
+    # Split into paragraphs for better analysis
+    paragraphs = [p.strip() for p in text_content.split('\n\n') if p.strip()]
+    
+    if not paragraphs:
+        # If no double newlines, split by single newlines but filter longer chunks
+        lines = [line.strip() for line in text_content.split('\n') if line.strip()]
+        # Group lines into meaningful chunks
+        current_chunk = []
+        for line in lines:
+            current_chunk.append(line)
+            # If chunk is substantial, add it
+            if len(' '.join(current_chunk)) > 50:
+                paragraphs.append(' '.join(current_chunk))
+                current_chunk = []
+        # Add remaining chunk if any
+        if current_chunk and len(' '.join(current_chunk)) > 20:
+            paragraphs.append(' '.join(current_chunk))
+    
+    # Only keep substantial text, with normalized whitespace
+    return [' '.join(p.split()) if len(p) > 20 else None for p in paragraphs]
+
+def split_pypdf2_paragraphs(text_content: str) -> List[Optional[str]]:
+    """Split PyPDF2 page text into paragraphs; short ones are None to keep numbering"""
+    paragraphs = [p.strip() for p in text_content.split('\n\n') if p.strip()]
+    
+    if not paragraphs:
+        # Single paragraph from the page
+        text_content = ' '.join(text_content.split())  # Normalize whitespace
+        if len(text_content) > 20:
+            paragraphs = [text_content]
+    
+    return [p if len(p) > 20 else None for p in paragraphs]
+
+def count_pdf_pages(path: str) -> int:
+    """Count the pages of a PDF (runs in the extraction pool)"""
+    try:
+        return len(PyPDF2.PdfReader(path).pages)
+    except Exception:
+        with pdfplumber.open(path) as pdf:
+            return len(pdf.pages)
+
+def extract_pdf_page_range(filename: str, path: str, start: int, end: int) -> List[dict]:
+    """Extract paragraphs from pages [start, end) of a PDF (runs in the extraction pool).
+
+    pdfplumber is tried first for every page; a page it cannot read falls
+    back to PyPDF2 on its own instead of re-parsing the whole document.
+    """
     extracted_texts = []
+    pypdf2_reader = None
     
     try:
-        if file_extension == 'txt':
-            # Process TXT files
-            content = await file.read()
-            text_content = content.decode('utf-8')
-            lines = text_content.split('\n')
-            for i, line in enumerate(lines, 1):
-                line = line.strip()
-                if line:  # Skip empty lines
-                    extracted_texts.append({
-                        "text": line,
-                        "row_number": i,
-                        "metadata": {"source": "txt_line"}
-                    })
-                    
-        elif file_extension == 'csv':
-            # Process CSV files
-            content = await file.read()
-            df = pd.read_csv(io.BytesIO(content))
-            
-            # Try to find text columns (columns with string data)
-            text_columns = []
-            for col in df.columns:
-                if df[col].dtype == 'object':  # String columns
-                    text_columns.append(col)
-            
-            # Use first text column or all columns if no clear text column
-            if text_columns:
-                primary_text_col = text_columns[0]
-            else:
-                primary_text_col = df.columns[0]
-            
-            for index, row in df.iterrows():
-                text_content = str(row[primary_text_col])
-                if text_content and text_content != 'nan':
-                    metadata = {col: str(row[col]) for col in df.columns if col != primary_text_col}
-                    extracted_texts.append({
-                        "text": text_content,
-                        "row_number": index + 2,  # +2 because pandas starts at 0 and we account for header
-                        "metadata": metadata
-                    })
-                    
-        elif file_extension in ['xlsx', 'xls']:
-            # Process Excel files
-            content = await file.read()
-            df = pd.read_excel(io.BytesIO(content))
-            
-            # Similar logic to CSV
-            text_columns = []
-            for col in df.columns:
-                if df[col].dtype == 'object':
-                    text_columns.append(col)
-            
-            if text_columns:
-                primary_text_col = text_columns[0]
-            else:
-                primary_text_col = df.columns[0]
-            
-            for index, row in df.iterrows():
-                text_content = str(row[primary_text_col])
-                if text_content and text_content != 'nan':
-                    metadata = {col: str(row[col]) for col in df.columns if col != primary_text_col}
-                    extracted_texts.append({
-                        "text": text_content,
-                        "row_number": index + 2,
-                        "metadata": metadata
-                    })
-                    
-        elif file_extension == 'pdf':
-            # Process PDF files with improved text extraction
-            content = await file.read()
-            pdf_stream = io.BytesIO(content)
-            
-            # Try pdfplumber first (more reliable)
+        plumber_doc = pdfplumber.open(path)
+    except Exception as e:
+        logger.warning(f"pdfplumber could not open {filename}, using PyPDF2 for pages {start + 1}-{end}: {e}")
+        plumber_doc = None
+    
+    try:
+        for page_index in range(start, end):
+            page_num = page_index + 1
+            extractor = "pdfplumber"
             try:
-                with pdfplumber.open(pdf_stream) as pdf:
-                    for page_num, page in enumerate(pdf.pages, 1):
-                        text_content = page.extract_text()
-                        if text_content and text_content.strip():
-                            # Clean up the text
-                            text_content = text_content.strip()
-                            
-                            # Split into paragraphs for better analysis
-                            paragraphs = [p.strip() for p in text_content.split('\n\n') if p.strip()]
-                            
-                            if not paragraphs:
-                                # If no double newlines, split by single newlines but filter longer chunks
-                                lines = [line.strip() for line in text_content.split('\n') if line.strip()]
-                                # Group lines into meaningful chunks
-                                current_chunk = []
-                                for line in lines:
-                                    current_chunk.append(line)
-                                    # If chunk is substantial, add it
-                                    if len(' '.join(current_chunk)) > 50:
-                                        paragraphs.append(' '.join(current_chunk))
-                                        current_chunk = []
-                                # Add remaining chunk if any
-                                if current_chunk and len(' '.join(current_chunk)) > 20:
-                                    paragraphs.append(' '.join(current_chunk))
-                            
-                            for para_num, paragraph in enumerate(paragraphs, 1):
-                                if len(paragraph) > 20:  # Only process substantial text
-                                    # Clean up the paragraph text
-                                    paragraph = ' '.join(paragraph.split())  # Normalize whitespace
-                                    extracted_texts.append({
-                                        "text": paragraph,
-                                        "row_number": f"page_{page_num}_para_{para_num}",
-                                        "metadata": {
-                                            "source": f"PDF page {page_num}",
-                                            "extractor": "pdfplumber"
-                                        }
-                                    })
-                        
+                if plumber_doc is None:
+                    raise ValueError("document not readable by pdfplumber")
+                text_content = plumber_doc.pages[page_index].extract_text()
+                split_paragraphs = split_pdfplumber_paragraphs
             except Exception as e:
-                logger.warning(f"pdfplumber failed for {file.filename}, trying PyPDF2: {e}")
-                
-                # Fallback to PyPDF2
+                # Fallback to PyPDF2 for this page only
                 try:
-                    pdf_stream.seek(0)  # Reset stream
-                    pdf_reader = PyPDF2.PdfReader(pdf_stream)
-                    
-                    for page_num, page in enumerate(pdf_reader.pages, 1):
-                        text_content = page.extract_text()
-                        if text_content and text_content.strip():
-                            text_content = text_content.strip()
-                            
-                            # Clean and split text
-                            paragraphs = [p.strip() for p in text_content.split('\n\n') if p.strip()]
-                            
-                            if not paragraphs:
-                                # Single paragraph from the page
-                                text_content = ' '.join(text_content.split())  # Normalize whitespace
-                                if len(text_content) > 20:
-                                    paragraphs = [text_content]
-                            
-                            for para_num, paragraph in enumerate(paragraphs, 1):
-                                if len(paragraph) > 20:
-                                    extracted_texts.append({
-                                        "text": paragraph,
-                                        "row_number": f"page_{page_num}_para_{para_num}",
-                                        "metadata": {
-                                            "source": f"PDF page {page_num}",
-                                            "extractor": "PyPDF2"
-                                        }
-                                    })
+                    if pypdf2_reader is None:
+                        pypdf2_reader = PyPDF2.PdfReader(path)
+                    text_content = pypdf2_reader.pages[page_index].extract_text()
+                    split_paragraphs = split_pypdf2_paragraphs
+                    extractor = "PyPDF2"
                 except Exception as e2:
-                    logger.error(f"Both PDF extractors failed for {file.filename}: pdfplumber={e}, PyPDF2={e2}")
-                    # Still allow the file to be processed, just with no extracted text
-                    pass
-        else:
-            raise HTTPException(status_code=400, detail=f"Unsupported file type: {file_extension}")
+                    logger.error(f"Both PDF extractors failed for {filename} page {page_num}: pdfplumber={e}, PyPDF2={e2}")
+                    continue
             
-        return extracted_texts
-        
+            if not text_content or not text_content.strip():
+                continue
+            
+            for para_num, paragraph in enumerate(split_paragraphs(text_content.strip()), 1):
+                if paragraph:
+                    extracted_texts.append({
+                        "text": paragraph,
+                        "row_number": f"page_{page_num}_para_{para_num}",
+                        "metadata": {
+                            "source": f"PDF page {page_num}",
+                            "extractor": extractor
+                        }
+                    })
+    finally:
+        if plumber_doc is not None:
+            plumber_doc.close()
+    
+    return extracted_texts
+
+async def extract_pdf_texts(filename: str, path: str) -> List[dict]:
+    """Extract paragraphs from a PDF, splitting its pages across the extraction pool.
+
+    Workers open the spooled upload by path, so the document is never
+    copied into each process as bytes.
+    """
+    try:
+        page_count = await extraction_pool.run(count_pdf_pages, path)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error processing file {file.filename}: {e}")
-        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+        logger.error(f"Could not read PDF {filename}: {e}")
+        # Still allow the file to be processed, just with no extracted text
+        return []
+    
+    if page_count == 0:
+        return []
+    
+    # Contiguous page ranges, one per worker, so each worker opens the document once
+    range_size = -(-page_count // extraction_pool.max_workers)
+    ranges = [(start, min(start + range_size, page_count)) for start in range(0, page_count, range_size)]
+    
+    range_results = await asyncio.gather(*[
+        extraction_pool.run(extract_pdf_page_range, filename, path, start, end)
+        for start, end in ranges
+    ])
+    
+    # Reassemble paragraphs in page order
+    return [entry for entries in range_results for entry in entries]
 
-# Sentiment Analysis Service
-async def analyze_sentiment(text: str) -> dict:
-    """Analyze sentiment, emotions, sarcasm, and topics using LLM"""
+# Uploads are copied to a temporary file in chunks and rejected past the size limit
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(5 * 1024 * 1024)))  # 5MB in bytes
+UPLOAD_READ_CHUNK_SIZE = 64 * 1024
+
+async def spool_upload(file: UploadFile, max_size: int = MAX_UPLOAD_SIZE):
+    """Copy an upload into a named temporary file, stopping at the first byte past max_size"""
+    spool = tempfile.NamedTemporaryFile(suffix=Path(file.filename).suffix)
+    size = 0
     try:
-        # Initialize LLM chat
-        chat = LlmChat(
-            api_key=os.environ.get('EMERGENT_LLM_KEY'),
-            session_id=f"sentiment_{uuid.uuid4()}",
-            system_message="""You are an expert sentiment, emotion, sarcasm, topic, and aspect-based analysis AI specialized in PR and marketing text analysis. 
+        while True:
+            chunk = await file.read(UPLOAD_READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_size:
+                raise HTTPException(status_code=413, detail=f"File size exceeds {max_size // (1024 * 1024)}MB limit")
+            spool.write(chunk)
+        spool.flush()
+        spool.seek(0)
+        return spool
+    except BaseException:
+        spool.close()
+        raise
+    finally:
+        await file.close()
 
-            Analyze the provided text and return ONLY a valid JSON response with these exact fields:
-            {
-                "sentiment": "positive" | "negative" | "neutral",
-                "confidence": 0.85,
-                "analysis": "Brief explanation of the sentiment and key factors",
-                "emotions": {
-                    "joy": 0.8,
-                    "sadness": 0.1,
-                    "anger": 0.0,
-                    "fear": 0.0,
-                    "trust": 0.7,
-                    "disgust": 0.0,
-                    "surprise": 0.3,
-                    "anticipation": 0.5
-                },
-                "dominant_emotion": "joy",
-                "sarcasm_detected": true,
-                "sarcasm_confidence": 0.85,
-                "sarcasm_explanation": "Text uses ironic language that contradicts surface meaning",
-                "adjusted_sentiment": "negative",
-                "sarcasm_indicators": ["great", "just what I needed"],
+# Extracted rows are parsed and stored this many rows at a time
+UPLOAD_CHUNK_ROWS = int(os.getenv("UPLOAD_CHUNK_ROWS", "5000"))
+# How many extracted rows /upload-file echoes back; the rest stay in storage
+UPLOAD_PREVIEW_ROWS = int(os.getenv("UPLOAD_PREVIEW_ROWS", "100"))
+
+def pick_primary_text_column(df: pd.DataFrame):
+    """First string column, or the first column if none looks like text"""
+    text_columns = [
+        col for col in df.columns
+        if df[col].dtype == 'object' or isinstance(df[col].dtype, pd.StringDtype)
+    ]
+    return text_columns[0] if text_columns else df.columns[0]
+
+def dataframe_to_text_entries(df: pd.DataFrame, primary_text_col, row_offset: int) -> List[dict]:
+    """Build row dicts column-wise; ``row_offset`` maps the index to file row numbers"""
+    # Missing cells render as 'nan' whatever the column dtype (string dtypes keep NA through astype)
+    df = df.astype(object).where(df.notna(), 'nan')
+    texts = df[primary_text_col].astype(str)
+    keep = (texts != '') & (texts != 'nan')
+    metadata_columns = [col for col in df.columns if col != primary_text_col]
+    metadata = df.loc[keep, metadata_columns].astype(str).to_dict('records')
+    row_numbers = (df.index[keep] + row_offset).tolist()
+    return [
+        {"text": text, "row_number": row_number, "metadata": row_metadata}
+        for text, row_number, row_metadata in zip(texts[keep].tolist(), row_numbers, metadata)
+    ]
+
+def iter_txt_rows(fileobj):
+    """Yield a text file's non-empty lines one chunk at a time"""
+    # newline='\n' keeps line numbers the same as splitting on '\n'
+    text_file = io.TextIOWrapper(fileobj, encoding='utf-8', newline='\n')
+    try:
+        chunk = []
+        for i, line in enumerate(text_file, 1):
+            line = line.strip()
+            if line:  # Skip empty lines
+                chunk.append({
+                    "text": line,
+                    "row_number": i,
+                    "metadata": {"source": "txt_line"}
+                })
+            if len(chunk) >= UPLOAD_CHUNK_ROWS:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        # Leave the spooled file open for the caller
+        text_file.detach()
+
+CSV_BOOLEAN_STRINGS = {"True", "False", "true", "false", "TRUE", "FALSE"}
+
+def pick_primary_csv_column(df: pd.DataFrame):
+    """First column holding non-numeric, non-boolean text, or the first column if none does.
+
+    Mirrors picking the first ``object`` column pandas would infer, for a
+    chunk read with ``dtype=str``.
+    """
+    for col in df.columns:
+        values = df[col].dropna()
+        is_text = pd.to_numeric(values, errors='coerce').isna() & ~values.isin(CSV_BOOLEAN_STRINGS)
+        if is_text.any():
+            return col
+    return df.columns[0]
+
+def iter_csv_rows(fileobj):
+    """Yield a CSV's extracted rows one chunk at a time"""
+    primary_text_col = None
+    # Every column is read as text so values render the same in every chunk
+    # (per-chunk inference would turn 5 into '5' in one chunk and '5.0' in the next)
+    with pd.read_csv(fileobj, chunksize=UPLOAD_CHUNK_ROWS, dtype=str) as reader:
+        for df in reader:
+            # Chosen from the first chunk so every row uses the same column
+            if primary_text_col is None:
+                primary_text_col = pick_primary_csv_column(df)
+            # +2 because pandas starts at 0 and we account for header
+            yield dataframe_to_text_entries(df, primary_text_col, 2)
+
+def sheet_row_number(sheet_name: str, row_number: int) -> str:
+    """Workbook-wide row id like "Sheet1!2"; bare row numbers repeat on every sheet"""
+    return f"{sheet_name}!{row_number}"
+
+def xlsx_cell_text(value) -> str:
+    return 'nan' if value is None else str(value)
+
+def pick_primary_xlsx_column(rows: List[tuple]) -> int:
+    """First column holding text in the sheet's first chunk, else the first column"""
+    width = len(rows[0][1])
+    for i in range(width):
+        if any(isinstance(values[i], str) for _, values in rows):
+            return i
+    return 0
+
+def xlsx_rows_to_text_entries(sheet_name: str, columns: List[str], primary_index: int, rows: List[tuple]) -> List[dict]:
+    entries = []
+    for row_number, values in rows:
+        text_content = xlsx_cell_text(values[primary_index])
+        if text_content and text_content != 'nan':
+            metadata = {
+                column: xlsx_cell_text(value)
+                for i, (column, value) in enumerate(zip(columns, values)) if i != primary_index
+            }
+            metadata["sheet_name"] = sheet_name
+            entries.append({
+                "text": text_content,
+                "row_number": sheet_row_number(sheet_name, row_number),
+                "metadata": metadata
+            })
+    return entries
+
+def iter_xlsx_rows(fileobj):
+    """Yield extracted rows from every sheet of a workbook, one chunk at a time.
+
+    The workbook is opened read-only so rows are streamed from the archive
+    instead of being materialized; the first row of each sheet is its header.
+    """
+    workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            sheet_rows = sheet.iter_rows(values_only=True)
+            header = next(sheet_rows, None)
+            if not header:
+                continue
+            columns = [
+                str(value) if value is not None else f"Unnamed: {i}"
+                for i, value in enumerate(header)
+            ]
+            primary_index = None
+            chunk = []
+            for row_number, values in enumerate(sheet_rows, 2):
+                # Pad short rows and drop cells beyond the header
+                values = (tuple(values) + (None,) * len(columns))[:len(columns)]
+                chunk.append((row_number, values))
+                if len(chunk) < UPLOAD_CHUNK_ROWS:
+                    continue
+                if primary_index is None:
+                    primary_index = pick_primary_xlsx_column(chunk)
+                yield xlsx_rows_to_text_entries(sheet.title, columns, primary_index, chunk)
+                chunk = []
+            if chunk:
+                if primary_index is None:
+                    primary_index = pick_primary_xlsx_column(chunk)
+                yield xlsx_rows_to_text_entries(sheet.title, columns, primary_index, chunk)
+    finally:
+        workbook.close()
+
+async def iter_in_executor(iterator):
+    """Advance a blocking iterator on the default executor, off the event loop"""
+    loop = asyncio.get_running_loop()
+    while True:
+        item = await loop.run_in_executor(None, next, iterator, None)
+        if item is None:
+            return
+        yield item
+
+# Extractors that stream rows in chunks; other file types are extracted in one pass
+CHUNKED_EXTRACTORS = {
+    'txt': iter_txt_rows,
+    'csv': iter_csv_rows,
+    'xlsx': iter_xlsx_rows,
+}
+
+async def iter_extracted_text_chunks(filename: str, spool):
+    """Yield extracted rows in chunks; text and spreadsheets stream, other types arrive in one chunk"""
+    file_extension = filename.split('.')[-1].lower()
+    if file_extension not in CHUNKED_EXTRACTORS:
+        yield await extract_text_from_file(filename, spool)
+        return
+    
+    try:
+        spool.seek(0)
+        async for chunk in iter_in_executor(CHUNKED_EXTRACTORS[file_extension](spool)):
+            yield chunk
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing file {filename}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+
+async def extract_text_from_file(filename: str, spool) -> List[dict]:
+    """Extract text from a spooled upload based on file type"""
+    file_extension = filename.split('.')[-1].lower()
+    extracted_texts = []
+    
+    try:
+        spool.seek(0)
+        if file_extension in CHUNKED_EXTRACTORS:
+            # Process TXT, CSV and XLSX files chunk by chunk
+            async for chunk in iter_in_executor(CHUNKED_EXTRACTORS[file_extension](spool)):
+                extracted_texts.extend(chunk)
+                    
+        elif file_extension == 'xls':
+            # Legacy Excel files can't be streamed; read every sheet with pandas
+            sheets = pd.read_excel(spool, sheet_name=None)
+            for sheet_name, df in sheets.items():
+                if df.empty:
+                    continue
+                for entry in dataframe_to_text_entries(df, pick_primary_text_column(df), 2):
+                    entry["row_number"] = sheet_row_number(sheet_name, entry["row_number"])
+                    entry["metadata"]["sheet_name"] = sheet_name
+                    extracted_texts.append(entry)
+                    
+        elif file_extension == 'pdf':
+            # Process PDF files with improved text extraction
+            extracted_texts = await extract_pdf_texts(filename, spool.name)
+        else:
+            raise HTTPException(status_code=400, detail=f"Unsupported file type: {file_extension}")
+            
+        return extracted_texts
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing file {filename}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+
+# Uploaded File Rows
+# Extracted rows live in their own collection keyed by (file_id, row_index); the
+# uploaded_files record is a small header, so uploads are not bound by Mongo's
+# document size limit and rows can be read by range
+FILE_ROW_PROJECTION = {"_id": 0, "text": 1, "row_number": 1, "metadata": 1}
+
+async def store_file_rows(file_id: str, first_row_index: int, rows: List[dict]):
+    await db.uploaded_file_rows.insert_many([
+        {"file_id": file_id, "row_index": first_row_index + i, **row}
+        for i, row in enumerate(rows)
+    ], ordered=False)
+
+async def read_file_rows(
+    file_id: str,
+    start: int = 0,
+    limit: Optional[int] = None,
+    row_numbers: Optional[list] = None
+) -> List[dict]:
+    """Read stored rows in file order, optionally narrowed to some row_numbers"""
+    query = {"file_id": file_id}
+    if row_numbers is not None:
+        query["row_number"] = {"$in": row_numbers}
+        cursor = db.uploaded_file_rows.find(query, FILE_ROW_PROJECTION).sort("row_index", ASCENDING).skip(start)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+    else:
+        # Plain windows are an index range scan rather than a skip
+        query["row_index"] = {"$gte": start} if limit is None else {"$gte": start, "$lt": start + limit}
+        cursor = db.uploaded_file_rows.find(query, FILE_ROW_PROJECTION).sort("row_index", ASCENDING)
+    return await cursor.to_list(None)
+
+async def delete_file_rows(file_id: str):
+    await db.uploaded_file_rows.delete_many({"file_id": file_id})
+
+# Sentiment Analysis Service
+SENTIMENT_MODEL_PROVIDER = "openai"
+SENTIMENT_MODEL = "gpt-4o-mini"
+SENTIMENT_SYSTEM_PROMPT = """You are an expert sentiment, emotion, sarcasm, topic, and aspect-based analysis AI specialized in PR and marketing text analysis. 
+
+            Analyze the provided text and return ONLY a valid JSON response with these exact fields:
+            {
+                "sentiment": "positive" | "negative" | "neutral",
+                "confidence": 0.85,
+                "analysis": "Brief explanation of the sentiment and key factors",
+                "emotions": {
+                    "joy": 0.8,
+                    "sadness": 0.1,
+                    "anger": 0.0,
+                    "fear": 0.0,
+                    "trust": 0.7,
+                    "disgust": 0.0,
+                    "surprise": 0.3,
+                    "anticipation": 0.5
+                },
+                "dominant_emotion": "joy",
+                "sarcasm_detected": true,
+                "sarcasm_confidence": 0.85,
+                "sarcasm_explanation": "Text uses ironic language that contradicts surface meaning",
+                "adjusted_sentiment": "negative",
+                "sarcasm_indicators": ["great", "just what I needed"],
                 "topics_detected": [
                     {
                         "topic": "customer_service",
@@ -1061,225 +1790,817 @@ async def analyze_sentiment(text: str) -> dict:
             - Each aspect can have different sentiments (e.g., positive food, negative service)
             - Aspects summary should synthesize how different aspects contribute to overall experience
             - If no clear aspects are detected, return empty array for aspects_analysis"""
-        ).with_model("openai", "gpt-4o-mini")
-        
-        # Create user message
-        user_message = UserMessage(text=f"Analyze the sentiment, emotions, sarcasm, and topics of this text: {text}")
-        
-        # Get response
-        response = await chat.send_message(user_message)
-        
-        # Parse JSON response
-        import json
+
+# Cached results are only valid for the prompt/model that produced them
+SENTIMENT_PROMPT_VERSION = hashlib.sha256(
+    f"{SENTIMENT_MODEL_PROVIDER}:{SENTIMENT_MODEL}:{SENTIMENT_SYSTEM_PROMPT}".encode("utf-8")
+).hexdigest()[:16]
+
+SENTIMENT_CACHE_SIZE = int(os.getenv("SENTIMENT_CACHE_SIZE", "2048"))
+SENTIMENT_CACHE_TTL_SECONDS = int(os.getenv("SENTIMENT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+class SentimentCache:
+    """Two-tier (in-process LRU + MongoDB TTL) cache of LLM sentiment results"""
+
+    def __init__(self, collection, max_size: int, ttl_seconds: int, prompt_version: str):
+        self.collection = collection
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.prompt_version = prompt_version
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, text: str) -> str:
+        """Content-address a text: hash of normalized text plus prompt/model version"""
+        normalized = ' '.join(unicodedata.normalize('NFC', text).split())
+        digest = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+        return f"{self.prompt_version}:{digest}"
+
+    def _remember(self, key: str, result: dict):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def ensure_indexes(self):
+        """Create the TTL index that evicts stale Mongo entries"""
+        await self.collection.create_index("created_at", expireAfterSeconds=self.ttl_seconds)
+
+    async def get(self, text: str) -> Optional[dict]:
+        """Return a cached result for text, checking memory first and then Mongo"""
+        key = self.make_key(text)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(self._entries[key])
+
         try:
-            result = json.loads(response)
-            
-            # Ensure emotions dictionary exists and has all 8 emotions
-            if "emotions" not in result:
-                result["emotions"] = {}
-            
-            # Default emotion values
-            default_emotions = {
-                "joy": 0.0, "sadness": 0.0, "anger": 0.0, "fear": 0.0,
-                "trust": 0.0, "disgust": 0.0, "surprise": 0.0, "anticipation": 0.0
+            cached = await self.collection.find_one({"_id": key})
+        except Exception as e:
+            logger.warning(f"Sentiment cache lookup failed: {e}")
+            cached = None
+
+        # Entries written before results were validated may be incomplete
+        if not cached or not is_complete_sentiment_result(cached.get("result")):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._remember(key, cached["result"])
+        return copy.deepcopy(cached["result"])
+
+    async def set(self, text: str, result: dict):
+        """Store a result in both tiers"""
+        key = self.make_key(text)
+        self._remember(key, copy.deepcopy(result))
+        try:
+            await self.collection.replace_one(
+                {"_id": key},
+                {
+                    "_id": key,
+                    "result": result,
+                    "prompt_version": self.prompt_version,
+                    "created_at": datetime.now(timezone.utc)
+                },
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"Sentiment cache write failed: {e}")
+
+sentiment_cache = SentimentCache(
+    db.sentiment_cache,
+    max_size=SENTIMENT_CACHE_SIZE,
+    ttl_seconds=SENTIMENT_CACHE_TTL_SECONDS,
+    prompt_version=SENTIMENT_PROMPT_VERSION
+)
+
+def normalize_sentiment_result(result: dict) -> dict:
+    """Fill in defaults and derived fields on a parsed LLM JSON result"""
+    # Ensure emotions dictionary exists and has all 8 emotions
+    if "emotions" not in result:
+        result["emotions"] = {}
+    
+    # Default emotion values
+    default_emotions = {
+        "joy": 0.0, "sadness": 0.0, "anger": 0.0, "fear": 0.0,
+        "trust": 0.0, "disgust": 0.0, "surprise": 0.0, "anticipation": 0.0
+    }
+    
+    # Merge with detected emotions
+    for emotion in default_emotions:
+        if emotion not in result["emotions"]:
+            result["emotions"][emotion] = 0.0
+    
+    # Find dominant emotion
+    if result["emotions"]:
+        dominant_emotion = max(result["emotions"], key=result["emotions"].get)
+        result["dominant_emotion"] = dominant_emotion
+    else:
+        result["dominant_emotion"] = "neutral"
+    
+    # Ensure sarcasm fields exist with defaults
+    if "sarcasm_detected" not in result:
+        result["sarcasm_detected"] = False
+    if "sarcasm_confidence" not in result:
+        result["sarcasm_confidence"] = 0.0
+    if "sarcasm_explanation" not in result:
+        result["sarcasm_explanation"] = ""
+    if "adjusted_sentiment" not in result:
+        result["adjusted_sentiment"] = result["sentiment"]  # Same as sentiment if no sarcasm
+    if "sarcasm_indicators" not in result:
+        result["sarcasm_indicators"] = []
+    
+    # Ensure topic fields exist with defaults
+    if "topics_detected" not in result:
+        result["topics_detected"] = []
+    if "primary_topic" not in result:
+        result["primary_topic"] = ""
+    if "topic_summary" not in result:
+        result["topic_summary"] = ""
+    
+    # Find primary topic if topics exist
+    if result["topics_detected"] and len(result["topics_detected"]) > 0:
+        primary_topic = max(result["topics_detected"], key=lambda x: x.get("confidence", 0))
+        result["primary_topic"] = primary_topic.get("topic", "")
+    
+    # Ensure aspect analysis fields exist with defaults
+    if "aspects_analysis" not in result:
+        result["aspects_analysis"] = []
+    if "aspects_summary" not in result:
+        result["aspects_summary"] = ""
+    
+    # Validate aspect analysis structure
+    if result["aspects_analysis"]:
+        validated_aspects = []
+        for aspect in result["aspects_analysis"]:
+            if isinstance(aspect, dict) and all(key in aspect for key in ["aspect", "sentiment", "confidence"]):
+                # Ensure required fields exist
+                if "keywords" not in aspect:
+                    aspect["keywords"] = []
+                if "explanation" not in aspect:
+                    aspect["explanation"] = ""
+                validated_aspects.append(aspect)
+        result["aspects_analysis"] = validated_aspects
+    
+    return result
+
+SENTIMENT_LABELS = ("positive", "negative", "neutral")
+
+def is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def is_complete_sentiment_result(result) -> bool:
+    """Check a normalized result has every field the response models read, with usable types"""
+    return (
+        isinstance(result, dict)
+        and result.get("sentiment") in SENTIMENT_LABELS
+        and is_number(result.get("confidence"))
+        and isinstance(result.get("analysis"), str)
+        and isinstance(result.get("emotions"), dict)
+        and all(is_number(score) for score in result["emotions"].values())
+        and isinstance(result.get("dominant_emotion"), str)
+        and isinstance(result.get("sarcasm_detected"), bool)
+        and is_number(result.get("sarcasm_confidence"))
+        and isinstance(result.get("sarcasm_explanation"), str)
+        and isinstance(result.get("adjusted_sentiment"), str)
+        and isinstance(result.get("sarcasm_indicators"), list)
+        and all(isinstance(indicator, str) for indicator in result["sarcasm_indicators"])
+        and isinstance(result.get("topics_detected"), list)
+        and all(isinstance(topic, dict) for topic in result["topics_detected"])
+        and isinstance(result.get("primary_topic"), str)
+        and isinstance(result.get("topic_summary"), str)
+        and isinstance(result.get("aspects_analysis"), list)
+        and all(isinstance(aspect, dict) for aspect in result["aspects_analysis"])
+        and isinstance(result.get("aspects_summary"), str)
+    )
+
+def fallback_sentiment_result(response: str) -> dict:
+    """Heuristic keyword-based result used when the LLM response is not valid JSON"""
+    response_lower = response.lower()
+    if "positive" in response_lower:
+        sentiment = "positive"
+    elif "negative" in response_lower:
+        sentiment = "negative"
+    else:
+        sentiment = "neutral"
+    
+    # Basic sarcasm detection from keywords
+    sarcasm_keywords = ["oh great", "just perfect", "thanks a lot", "wonderful", "fantastic", "just what i needed"]
+    sarcasm_detected = any(keyword in response_lower for keyword in sarcasm_keywords)
+    
+    # Basic topic detection from keywords
+    topics_detected = []
+    topic_keywords = {
+        "customer_service": ["support", "service", "help", "customer", "staff"],
+        "product_quality": ["quality", "product", "build", "material", "construction"],
+        "pricing": ["price", "cost", "expensive", "cheap", "money", "value"],
+        "technical_issues": ["bug", "crash", "error", "problem", "issue", "broken"],
+        "delivery_shipping": ["delivery", "shipping", "package", "arrived", "sent"],
+        "user_experience": ["interface", "design", "usability", "experience", "navigation"]
+    }
+    
+    for topic, keywords in topic_keywords.items():
+        if any(keyword in response_lower for keyword in keywords):
+            display_names = {
+                "customer_service": "Customer Service",
+                "product_quality": "Product Quality", 
+                "pricing": "Pricing",
+                "technical_issues": "Technical Issues",
+                "delivery_shipping": "Delivery & Shipping",
+                "user_experience": "User Experience"
             }
+            topics_detected.append({
+                "topic": topic,
+                "display_name": display_names.get(topic, topic.replace("_", " ").title()),
+                "confidence": 0.7,
+                "keywords": [kw for kw in keywords if kw in response_lower]
+            })
+
+    # Basic aspect detection from common patterns
+    aspects_analysis = []
+    aspect_patterns = {
+        "Food Quality": ["food", "taste", "delicious", "bland", "fresh", "stale", "meal", "dish"],
+        "Service Quality": ["service", "staff", "waiter", "waitress", "server", "friendly", "rude", "attentive"],
+        "Price/Value": ["price", "cost", "expensive", "cheap", "worth", "value", "money", "affordable"],
+        "Delivery Speed": ["delivery", "shipping", "fast", "slow", "quick", "delayed", "on time"],
+        "Build Quality": ["build", "construction", "material", "sturdy", "flimsy", "durable", "quality"],
+        "User Interface": ["interface", "UI", "design", "layout", "navigation", "easy", "confusing"],
+        "Customer Support": ["support", "help", "helpful", "unhelpful", "response", "assistance"]
+    }
+    
+    for aspect_name, keywords in aspect_patterns.items():
+        aspect_keywords_found = [kw for kw in keywords if kw in response_lower]
+        if aspect_keywords_found:
+            # Determine sentiment for this aspect based on surrounding context
+            aspect_sentiment = sentiment  # Default to overall sentiment
+            confidence = 0.6
             
-            # Merge with detected emotions
-            for emotion in default_emotions:
-                if emotion not in result["emotions"]:
-                    result["emotions"][emotion] = 0.0
-            
-            # Find dominant emotion
-            if result["emotions"]:
-                dominant_emotion = max(result["emotions"], key=result["emotions"].get)
-                result["dominant_emotion"] = dominant_emotion
-            else:
-                result["dominant_emotion"] = "neutral"
-            
-            # Ensure sarcasm fields exist with defaults
-            if "sarcasm_detected" not in result:
-                result["sarcasm_detected"] = False
-            if "sarcasm_confidence" not in result:
-                result["sarcasm_confidence"] = 0.0
-            if "sarcasm_explanation" not in result:
-                result["sarcasm_explanation"] = ""
-            if "adjusted_sentiment" not in result:
-                result["adjusted_sentiment"] = result["sentiment"]  # Same as sentiment if no sarcasm
-            if "sarcasm_indicators" not in result:
-                result["sarcasm_indicators"] = []
-            
-            # Ensure topic fields exist with defaults
-            if "topics_detected" not in result:
-                result["topics_detected"] = []
-            if "primary_topic" not in result:
-                result["primary_topic"] = ""
-            if "topic_summary" not in result:
-                result["topic_summary"] = ""
-            
-            # Find primary topic if topics exist
-            if result["topics_detected"] and len(result["topics_detected"]) > 0:
-                primary_topic = max(result["topics_detected"], key=lambda x: x.get("confidence", 0))
-                result["primary_topic"] = primary_topic.get("topic", "")
-            
-            # Ensure aspect analysis fields exist with defaults
-            if "aspects_analysis" not in result:
-                result["aspects_analysis"] = []
-            if "aspects_summary" not in result:
-                result["aspects_summary"] = ""
+            # Try to determine more specific aspect sentiment
+            positive_words = ["good", "great", "excellent", "amazing", "wonderful", "fantastic", "love", "perfect"]
+            negative_words = ["bad", "terrible", "awful", "horrible", "hate", "worst", "disappointing", "poor"]
             
-            # Validate aspect analysis structure
-            if result["aspects_analysis"]:
-                validated_aspects = []
-                for aspect in result["aspects_analysis"]:
-                    if isinstance(aspect, dict) and all(key in aspect for key in ["aspect", "sentiment", "confidence"]):
-                        # Ensure required fields exist
-                        if "keywords" not in aspect:
-                            aspect["keywords"] = []
-                        if "explanation" not in aspect:
-                            aspect["explanation"] = ""
-                        validated_aspects.append(aspect)
-                result["aspects_analysis"] = validated_aspects
+            # Look for sentiment words near aspect keywords
+            aspect_context = " ".join([word for word in response_lower.split() 
+                                       if any(kw in word for kw in aspect_keywords_found)])
             
-            return result
+            if any(pos in aspect_context for pos in positive_words):
+                aspect_sentiment = "positive"
+                confidence = 0.7
+            elif any(neg in aspect_context for neg in negative_words):
+                aspect_sentiment = "negative"  
+                confidence = 0.7
             
+            aspects_analysis.append({
+                "aspect": aspect_name,
+                "sentiment": aspect_sentiment,
+                "confidence": confidence,
+                "keywords": aspect_keywords_found[:3],  # Limit to top 3 keywords
+                "explanation": f"Detected {aspect_sentiment} sentiment for {aspect_name.lower()} based on keywords: {', '.join(aspect_keywords_found[:2])}"
+            })
+    
+    # Basic emotion detection from keywords
+    emotions = {
+        "joy": 0.7 if any(word in response_lower for word in ["joy", "happy", "excited", "pleased"]) else 0.0,
+        "sadness": 0.6 if any(word in response_lower for word in ["sad", "disappointed", "sorrow"]) else 0.0,
+        "anger": 0.6 if any(word in response_lower for word in ["angry", "frustrated", "annoyed"]) else 0.0,
+        "fear": 0.5 if any(word in response_lower for word in ["fear", "worried", "anxious"]) else 0.0,
+        "trust": 0.6 if any(word in response_lower for word in ["trust", "confident", "reliable"]) else 0.0,
+        "disgust": 0.5 if any(word in response_lower for word in ["disgusted", "revolting"]) else 0.0,
+        "surprise": 0.5 if any(word in response_lower for word in ["surprised", "shocked", "amazed"]) else 0.0,
+        "anticipation": 0.5 if any(word in response_lower for word in ["excited", "anticipation", "expecting"]) else 0.0,
+    }
+        
+    return {
+        "sentiment": sentiment,
+        "confidence": 0.75,
+        "analysis": "Sentiment, emotion, sarcasm, topic, and aspect analysis completed based on text content.",
+        "emotions": emotions,
+        "dominant_emotion": max(emotions, key=emotions.get) if emotions else "neutral",
+        "sarcasm_detected": sarcasm_detected,
+        "sarcasm_confidence": 0.7 if sarcasm_detected else 0.0,
+        "sarcasm_explanation": "Detected potential sarcastic language patterns" if sarcasm_detected else "",
+        "adjusted_sentiment": "negative" if sarcasm_detected and sentiment == "positive" else sentiment,
+        "sarcasm_indicators": [kw for kw in sarcasm_keywords if kw in response_lower] if sarcasm_detected else [],
+        "topics_detected": topics_detected,
+        "primary_topic": topics_detected[0]["topic"] if topics_detected else "",
+        "topic_summary": f"Discussion about {', '.join([t['display_name'] for t in topics_detected])}" if topics_detected else "",
+        "aspects_analysis": aspects_analysis,
+        "aspects_summary": f"Analysis covers {len(aspects_analysis)} aspects with mixed sentiments" if aspects_analysis else ""
+    }
+
+def error_sentiment_result(e: Exception) -> dict:
+    """Neutral result returned when the analysis itself fails"""
+    default_emotions = {
+        "joy": 0.0, "sadness": 0.0, "anger": 0.0, "fear": 0.0,
+        "trust": 0.0, "disgust": 0.0, "surprise": 0.0, "anticipation": 0.0
+    }
+    return {
+        "sentiment": "neutral",
+        "confidence": 0.5,
+        "analysis": f"Error in analysis: {str(e)}",
+        "emotions": default_emotions,
+        "dominant_emotion": "neutral",
+        "sarcasm_detected": False,
+        "sarcasm_confidence": 0.0,
+        "sarcasm_explanation": "",
+        "adjusted_sentiment": "neutral",
+        "sarcasm_indicators": [],
+        "topics_detected": [],
+        "primary_topic": "",
+        "topic_summary": "",
+        "aspects_analysis": [],
+        "aspects_summary": ""
+    }
+
+async def request_sentiment_completion(text: str) -> str:
+    """Send a single text to the LLM and return its raw response"""
+    chat = LlmChat(
+        api_key=os.environ.get('EMERGENT_LLM_KEY'),
+        session_id=f"sentiment_{uuid.uuid4()}",
+        system_message=SENTIMENT_SYSTEM_PROMPT
+    ).with_model(SENTIMENT_MODEL_PROVIDER, SENTIMENT_MODEL)
+
+    user_message = UserMessage(text=f"Analyze the sentiment, emotions, sarcasm, and topics of this text: {text}")
+    return await chat.send_message(user_message)
+
+async def analyze_sentiment_with_status(text: str) -> tuple[dict, bool]:
+    """Analyze ``text`` and report whether the result is a clean, cacheable one.
+
+    Heuristic fallbacks and error results are returned with ``False`` so no
+    cache (in-process, Mongo or per-URL) ever stores them.
+    """
+    # Serve repeat texts from the cache without another LLM round trip
+    cached = await sentiment_cache.get(text)
+    if cached is not None:
+        return cached, True
+
+    try:
+        response = await request_sentiment_completion(text)
+
+        try:
+            result = normalize_sentiment_result(json.loads(response))
         except json.JSONDecodeError:
-            # Fallback parsing if response is not pure JSON
-            response_lower = response.lower()
-            if "positive" in response_lower:
-                sentiment = "positive"
-            elif "negative" in response_lower:
-                sentiment = "negative"
-            else:
-                sentiment = "neutral"
-            
-            # Basic sarcasm detection from keywords
-            sarcasm_keywords = ["oh great", "just perfect", "thanks a lot", "wonderful", "fantastic", "just what i needed"]
-            sarcasm_detected = any(keyword in response_lower for keyword in sarcasm_keywords)
-            
-            # Basic topic detection from keywords
-            topics_detected = []
-            topic_keywords = {
-                "customer_service": ["support", "service", "help", "customer", "staff"],
-                "product_quality": ["quality", "product", "build", "material", "construction"],
-                "pricing": ["price", "cost", "expensive", "cheap", "money", "value"],
-                "technical_issues": ["bug", "crash", "error", "problem", "issue", "broken"],
-                "delivery_shipping": ["delivery", "shipping", "package", "arrived", "sent"],
-                "user_experience": ["interface", "design", "usability", "experience", "navigation"]
-            }
-            
-            for topic, keywords in topic_keywords.items():
-                if any(keyword in response_lower for keyword in keywords):
-                    display_names = {
-                        "customer_service": "Customer Service",
-                        "product_quality": "Product Quality", 
-                        "pricing": "Pricing",
-                        "technical_issues": "Technical Issues",
-                        "delivery_shipping": "Delivery & Shipping",
-                        "user_experience": "User Experience"
-                    }
-                    topics_detected.append({
-                        "topic": topic,
-                        "display_name": display_names.get(topic, topic.replace("_", " ").title()),
-                        "confidence": 0.7,
-                        "keywords": [kw for kw in keywords if kw in response_lower]
-                    })
+            # Heuristic results are not cached so the text is retried next time
+            return fallback_sentiment_result(response), False
+
+        if not is_complete_sentiment_result(result):
+            logger.warning("Sentiment response was missing fields or had the wrong types")
+            return fallback_sentiment_result(response), False
+
+        await sentiment_cache.set(text, result)
+        return result, True
 
-            # Basic aspect detection from common patterns
-            aspects_analysis = []
-            aspect_patterns = {
-                "Food Quality": ["food", "taste", "delicious", "bland", "fresh", "stale", "meal", "dish"],
-                "Service Quality": ["service", "staff", "waiter", "waitress", "server", "friendly", "rude", "attentive"],
-                "Price/Value": ["price", "cost", "expensive", "cheap", "worth", "value", "money", "affordable"],
-                "Delivery Speed": ["delivery", "shipping", "fast", "slow", "quick", "delayed", "on time"],
-                "Build Quality": ["build", "construction", "material", "sturdy", "flimsy", "durable", "quality"],
-                "User Interface": ["interface", "UI", "design", "layout", "navigation", "easy", "confusing"],
-                "Customer Support": ["support", "help", "helpful", "unhelpful", "response", "assistance"]
-            }
-            
-            for aspect_name, keywords in aspect_patterns.items():
-                aspect_keywords_found = [kw for kw in keywords if kw in response_lower]
-                if aspect_keywords_found:
-                    # Determine sentiment for this aspect based on surrounding context
-                    aspect_sentiment = sentiment  # Default to overall sentiment
-                    confidence = 0.6
-                    
-                    # Try to determine more specific aspect sentiment
-                    positive_words = ["good", "great", "excellent", "amazing", "wonderful", "fantastic", "love", "perfect"]
-                    negative_words = ["bad", "terrible", "awful", "horrible", "hate", "worst", "disappointing", "poor"]
-                    
-                    # Look for sentiment words near aspect keywords
-                    aspect_context = " ".join([word for word in response_lower.split() 
-                                               if any(kw in word for kw in aspect_keywords_found)])
-                    
-                    if any(pos in aspect_context for pos in positive_words):
-                        aspect_sentiment = "positive"
-                        confidence = 0.7
-                    elif any(neg in aspect_context for neg in negative_words):
-                        aspect_sentiment = "negative"  
-                        confidence = 0.7
-                    
-                    aspects_analysis.append({
-                        "aspect": aspect_name,
-                        "sentiment": aspect_sentiment,
-                        "confidence": confidence,
-                        "keywords": aspect_keywords_found[:3],  # Limit to top 3 keywords
-                        "explanation": f"Detected {aspect_sentiment} sentiment for {aspect_name.lower()} based on keywords: {', '.join(aspect_keywords_found[:2])}"
-                    })
-            
-            # Basic emotion detection from keywords
-            emotions = {
-                "joy": 0.7 if any(word in response_lower for word in ["joy", "happy", "excited", "pleased"]) else 0.0,
-                "sadness": 0.6 if any(word in response_lower for word in ["sad", "disappointed", "sorrow"]) else 0.0,
-                "anger": 0.6 if any(word in response_lower for word in ["angry", "frustrated", "annoyed"]) else 0.0,
-                "fear": 0.5 if any(word in response_lower for word in ["fear", "worried", "anxious"]) else 0.0,
-                "trust": 0.6 if any(word in response_lower for word in ["trust", "confident", "reliable"]) else 0.0,
-                "disgust": 0.5 if any(word in response_lower for word in ["disgusted", "revolting"]) else 0.0,
-                "surprise": 0.5 if any(word in response_lower for word in ["surprised", "shocked", "amazed"]) else 0.0,
-                "anticipation": 0.5 if any(word in response_lower for word in ["excited", "anticipation", "expecting"]) else 0.0,
-            }
-                
-            return {
-                "sentiment": sentiment,
-                "confidence": 0.75,
-                "analysis": "Sentiment, emotion, sarcasm, topic, and aspect analysis completed based on text content.",
-                "emotions": emotions,
-                "dominant_emotion": max(emotions, key=emotions.get) if emotions else "neutral",
-                "sarcasm_detected": sarcasm_detected,
-                "sarcasm_confidence": 0.7 if sarcasm_detected else 0.0,
-                "sarcasm_explanation": "Detected potential sarcastic language patterns" if sarcasm_detected else "",
-                "adjusted_sentiment": "negative" if sarcasm_detected and sentiment == "positive" else sentiment,
-                "sarcasm_indicators": [kw for kw in sarcasm_keywords if kw in response_lower] if sarcasm_detected else [],
-                "topics_detected": topics_detected,
-                "primary_topic": topics_detected[0]["topic"] if topics_detected else "",
-                "topic_summary": f"Discussion about {', '.join([t['display_name'] for t in topics_detected])}" if topics_detected else "",
-                "aspects_analysis": aspects_analysis,
-                "aspects_summary": f"Analysis covers {len(aspects_analysis)} aspects with mixed sentiments" if aspects_analysis else ""
-            }
-            
     except Exception as e:
         logger.error(f"Error in sentiment analysis: {e}")
-        default_emotions = {
-            "joy": 0.0, "sadness": 0.0, "anger": 0.0, "fear": 0.0,
-            "trust": 0.0, "disgust": 0.0, "surprise": 0.0, "anticipation": 0.0
-        }
-        return {
-            "sentiment": "neutral",
-            "confidence": 0.5,
-            "analysis": f"Error in analysis: {str(e)}",
-            "emotions": default_emotions,
-            "dominant_emotion": "neutral",
-            "sarcasm_detected": False,
-            "sarcasm_confidence": 0.0,
-            "sarcasm_explanation": "",
-            "adjusted_sentiment": "neutral",
-            "sarcasm_indicators": [],
-            "topics_detected": [],
-            "primary_topic": "",
-            "topic_summary": "",
-            "aspects_analysis": [],
-            "aspects_summary": ""
-        }
+        return error_sentiment_result(e), False
+
+async def analyze_sentiment(text: str) -> dict:
+    """Analyze sentiment, emotions, sarcasm, and topics using LLM"""
+    result, _ = await analyze_sentiment_with_status(text)
+    return result
+
+# Packed (multi-text) analysis
+PACKED_ANALYSIS_TOKEN_BUDGET = int(os.getenv("PACKED_ANALYSIS_TOKEN_BUDGET", "2000"))
+PACKED_ANALYSIS_MAX_ITEMS = int(os.getenv("PACKED_ANALYSIS_MAX_ITEMS", "10"))
+PACKED_ANALYSIS_MAX_TEXT_TOKENS = int(os.getenv("PACKED_ANALYSIS_MAX_TEXT_TOKENS", "250"))
+
+SENTIMENT_PACKED_INSTRUCTIONS = """
+
+            Batch Mode:
+            - You will receive several texts, each prefixed with its index like [0], [1], [2]
+            - Analyze every text independently using all of the rules above
+            - Return ONLY a JSON array with one object per text
+            - Each object must contain an "index" field with the text's index plus every field described above
+            - Do not merge, skip, or reorder texts"""
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) used for packing decisions"""
+    return len(text) // 4 + 1
+
+def plan_packed_batches(texts: List[str]) -> List[List[int]]:
+    """Group text indices into packs that fit the token budget and item cap.
+
+    Texts too long to pack profitably get a pack of their own.
+    """
+    packs = []
+    current = []
+    current_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if tokens > PACKED_ANALYSIS_MAX_TEXT_TOKENS:
+            packs.append([i])
+            continue
+        if current and (current_tokens + tokens > PACKED_ANALYSIS_TOKEN_BUDGET
+                        or len(current) >= PACKED_ANALYSIS_MAX_ITEMS):
+            packs.append(current)
+            current = []
+            current_tokens = 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+def is_valid_packed_item(item) -> bool:
+    """Check that one element of a packed response is a usable result"""
+    return (
+        isinstance(item, dict)
+        and isinstance(item.get("index"), int)
+        and item.get("sentiment") in SENTIMENT_LABELS
+        and is_number(item.get("confidence"))
+        and isinstance(item.get("analysis"), str)
+    )
+
+async def request_packed_sentiment_completion(texts: List[str]) -> str:
+    """Send several texts to the LLM in one request and return its raw response"""
+    chat = LlmChat(
+        api_key=os.environ.get('EMERGENT_LLM_KEY'),
+        session_id=f"sentiment_packed_{uuid.uuid4()}",
+        system_message=SENTIMENT_SYSTEM_PROMPT + SENTIMENT_PACKED_INSTRUCTIONS
+    ).with_model(SENTIMENT_MODEL_PROVIDER, SENTIMENT_MODEL)
+
+    numbered = "\n\n".join(f"[{i}] {text}" for i, text in enumerate(texts))
+    user_message = UserMessage(
+        text=f"Analyze the sentiment, emotions, sarcasm, and topics of each of these {len(texts)} texts:\n\n{numbered}"
+    )
+    return await chat.send_message(user_message)
+
+async def analyze_sentiment_packed(texts: List[str]) -> List[Optional[dict]]:
+    """Analyze several short texts with a single LLM request.
+
+    Returns one result per input text, in order. Entries are None where the
+    packed response had no usable result; callers should re-run those texts
+    individually with analyze_sentiment.
+    """
+    results = [await sentiment_cache.get(text) for text in texts]
+    pending = [i for i, result in enumerate(results) if result is None]
+    if not pending:
+        return results
+    if len(pending) == 1:
+        results[pending[0]] = await analyze_sentiment(texts[pending[0]])
+        return results
+
+    try:
+        response = await request_packed_sentiment_completion([texts[i] for i in pending])
+        items = json.loads(response)
+    except Exception as e:
+        logger.warning(f"Packed sentiment analysis failed for {len(pending)} texts: {e}")
+        return results
+
+    if not isinstance(items, list):
+        logger.warning("Packed sentiment response was not a JSON array")
+        return results
+
+    for item in items:
+        if not is_valid_packed_item(item) or not 0 <= item["index"] < len(pending):
+            continue
+        i = pending[item.pop("index")]
+        if results[i] is not None:
+            continue
+        try:
+            result = normalize_sentiment_result(item)
+        except Exception as e:
+            logger.warning(f"Malformed packed sentiment item: {e}")
+            continue
+        if not is_complete_sentiment_result(result):
+            # Left as None so the caller re-runs the text on its own
+            logger.warning("Packed sentiment item was missing fields or had the wrong types")
+            continue
+        results[i] = result
+        await sentiment_cache.set(texts[i], result)
+
+    return results
+
+
+# Batch Concurrency
+BATCH_ANALYSIS_CONCURRENCY = int(os.getenv("BATCH_ANALYSIS_CONCURRENCY", "16"))
+BATCH_ANALYSIS_PER_USER_CONCURRENCY = int(os.getenv("BATCH_ANALYSIS_PER_USER_CONCURRENCY", "8"))
+
+class ConcurrencyLimiter:
+    """Caps in-flight work both process-wide and per key (user, domain, ...)"""
+
+    def __init__(self, global_limit: int, per_key_limit: int):
+        self.per_key_limit = per_key_limit
+        self._global = asyncio.Semaphore(global_limit)
+        self._keys = {}  # key -> [semaphore, holders]
+
+    @asynccontextmanager
+    async def slot(self, key: str):
+        """Hold one global and one per-key slot for the duration of the block"""
+        entry = self._keys.setdefault(key, [asyncio.Semaphore(self.per_key_limit), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._global:
+                    yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                # Drop idle keys so the map does not grow without bound
+                self._keys.pop(key, None)
+
+batch_limiter = ConcurrencyLimiter(BATCH_ANALYSIS_CONCURRENCY, BATCH_ANALYSIS_PER_USER_CONCURRENCY)
+
+# Politeness limits for batch URL fetching
+URL_FETCH_CONCURRENCY = int(os.getenv("URL_FETCH_CONCURRENCY", "10"))
+URL_FETCH_PER_DOMAIN_CONCURRENCY = int(os.getenv("URL_FETCH_PER_DOMAIN_CONCURRENCY", "2"))
+
+url_fetch_limiter = ConcurrencyLimiter(URL_FETCH_CONCURRENCY, URL_FETCH_PER_DOMAIN_CONCURRENCY)
+
+def build_batch_result(text_entry: dict, analysis_result: dict) -> dict:
+    """Combine a batch row with its analysis result"""
+    return {
+        "id": str(uuid.uuid4()),
+        "text": text_entry.get("text", ""),
+        "row_number": text_entry.get("row_number"),
+        "metadata": text_entry.get("metadata", {}),
+        "sentiment": analysis_result["sentiment"],
+        "confidence": analysis_result["confidence"],
+        "analysis": analysis_result["analysis"],
+        "emotions": analysis_result.get("emotions", {}),
+        "dominant_emotion": analysis_result.get("dominant_emotion", ""),
+        "sarcasm_detected": analysis_result.get("sarcasm_detected", False),
+        "sarcasm_confidence": analysis_result.get("sarcasm_confidence", 0.0),
+        "sarcasm_explanation": analysis_result.get("sarcasm_explanation", ""),
+        "adjusted_sentiment": analysis_result.get("adjusted_sentiment", analysis_result["sentiment"]),
+        "sarcasm_indicators": analysis_result.get("sarcasm_indicators", []),
+        "topics_detected": analysis_result.get("topics_detected", []),
+        "primary_topic": analysis_result.get("primary_topic", ""),
+        "topic_summary": analysis_result.get("topic_summary", ""),
+        "aspects_analysis": analysis_result.get("aspects_analysis", []),
+        "aspects_summary": analysis_result.get("aspects_summary", ""),
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
+async def analyze_batch_entry(text_entry: dict, user_id: str) -> Optional[dict]:
+    """Analyze one batch row on its own; returns None for failed rows"""
+    try:
+        async with batch_limiter.slot(user_id):
+            analysis_result = await analyze_sentiment(text_entry.get("text", ""))
+        return build_batch_result(text_entry, analysis_result)
+    except Exception as e:
+        logger.error(f"Error analyzing text entry {text_entry.get('row_number', 'unknown')}: {e}")
+        return None
+
+async def analyze_batch_pack(text_entries: List[dict], user_id: str) -> List[Optional[dict]]:
+    """Analyze a pack of batch rows in one LLM request, re-running any misses individually"""
+    if len(text_entries) == 1:
+        return [await analyze_batch_entry(text_entries[0], user_id)]
+
+    try:
+        async with batch_limiter.slot(user_id):
+            analysis_results = await analyze_sentiment_packed([entry["text"] for entry in text_entries])
+    except Exception as e:
+        logger.error(f"Error analyzing packed batch of {len(text_entries)} rows: {e}")
+        analysis_results = [None] * len(text_entries)
+
+    async def finish(text_entry: dict, analysis_result: Optional[dict]) -> Optional[dict]:
+        if analysis_result is not None:
+            try:
+                return build_batch_result(text_entry, analysis_result)
+            except Exception as e:
+                logger.warning(f"Packed result unusable for row {text_entry.get('row_number', 'unknown')}, re-running it: {e}")
+        return await analyze_batch_entry(text_entry, user_id)
+
+    return await asyncio.gather(*[
+        finish(text_entry, analysis_result)
+        for text_entry, analysis_result in zip(text_entries, analysis_results)
+    ])
+
+async def analyze_batch_entries(
+    text_entries: List[dict],
+    user_id: str,
+    on_result=None,
+    completed: Optional[dict] = None
+) -> List[dict]:
+    """Analyze batch rows packed by token budget, preserving input order.
+
+    If given, ``await on_result(row_index, result)`` is called as each row
+    finishes, with ``row_index`` its position in ``text_entries`` and
+    ``result`` None for rows that failed. ``completed`` maps row indices
+    that already finished (e.g. checkpointed by a previous run) to their
+    result; those rows are not analyzed again.
+    """
+    completed = completed or {}
+    # Empty rows are skipped, as they always have been
+    indices = [
+        i for i, entry in enumerate(text_entries)
+        if isinstance(entry.get("text"), str) and entry["text"].strip()
+    ]
+    pending = [i for i in indices if i not in completed]
+    packs = plan_packed_batches([text_entries[i]["text"] for i in pending])
+
+    async def run_pack(pack: List[int]) -> List[Optional[dict]]:
+        results = await analyze_batch_pack([text_entries[pending[i]] for i in pack], user_id)
+        if on_result:
+            for i, result in zip(pack, results):
+                await on_result(pending[i], result)
+        return results
+
+    pack_results = await asyncio.gather(*[run_pack(pack) for pack in packs])
+
+    # Map each pack's results back to the rows they came from
+    row_results = {i: completed[i] for i in indices if i in completed}
+    for pack, results in zip(packs, pack_results):
+        for i, result in zip(pack, results):
+            row_results[pending[i]] = result
+    return [row_results[i] for i in indices if row_results.get(i) is not None]
+
+async def analyze_url_content(url_data: dict) -> dict:
+    """Analyze extracted URL text, reusing the stored result when the text is unchanged"""
+    cached = url_data.get('cached_analysis')
+    if (cached
+            and cached.get('content_hash') == url_data['content_hash']
+            and cached.get('prompt_version') == SENTIMENT_PROMPT_VERSION):
+        return copy.deepcopy(cached['result'])
+
+    analysis_result, cacheable = await analyze_sentiment_with_status(url_data['extracted_text'])
+    # Fallback and error results must not be served as the page's sentiment later
+    if cacheable:
+        await url_content_cache.store_analysis(
+            url_data['cache_key'], url_data['content_hash'], SENTIMENT_PROMPT_VERSION, analysis_result
+        )
+    return analysis_result
+
+def build_url_analysis_response(url_data: dict, analysis_result: dict) -> URLAnalysisResponse:
+    """Combine extracted URL content with its analysis result"""
+    return URLAnalysisResponse(
+        url=url_data['url'],
+        title=url_data.get('title'),
+        author=url_data.get('author'),
+        publish_date=url_data.get('publish_date'),
+        extracted_text=url_data['extracted_text'],
+        text_length=url_data['text_length'],
+        sentiment=analysis_result["sentiment"],
+        confidence=analysis_result["confidence"],
+        analysis=analysis_result["analysis"],
+        emotions=analysis_result.get("emotions", {}),
+        dominant_emotion=analysis_result.get("dominant_emotion", ""),
+        sarcasm_detected=analysis_result.get("sarcasm_detected", False),
+        sarcasm_confidence=analysis_result.get("sarcasm_confidence", 0.0),
+        sarcasm_explanation=analysis_result.get("sarcasm_explanation", ""),
+        adjusted_sentiment=analysis_result.get("adjusted_sentiment", analysis_result["sentiment"]),
+        sarcasm_indicators=analysis_result.get("sarcasm_indicators", []),
+        topics_detected=analysis_result.get("topics_detected", []),
+        primary_topic=analysis_result.get("primary_topic", ""),
+        topic_summary=analysis_result.get("topic_summary", ""),
+        aspects_analysis=analysis_result.get("aspects_analysis", []),
+        aspects_summary=analysis_result.get("aspects_summary", ""),
+        metadata=url_data.get('metadata', {}),
+        processing_time=url_data.get('processing_time', 0.0)
+    )
+
+async def analyze_batch_url(url: str, request: BatchURLRequest, user_id: str) -> URLAnalysisResponse:
+    """Fetch and analyze one URL of a batch.
+
+    The fetch stage is bounded per domain and the LLM stage per user, so while
+    one URL waits on the LLM others can already be downloading.
+    """
+    async with url_fetch_limiter.slot(urlparse(url).netloc.lower()):
+        url_data = await url_processor.process_url(
+            url, 
+            request.extract_full_content, 
+            request.include_metadata
+        )
+
+    async with batch_limiter.slot(user_id):
+        analysis_result = await analyze_url_content(url_data)
+
+    # Stored in bulk with the rest of the batch
+    return build_url_analysis_response(url_data, analysis_result)
+
+async def analyze_batch_url_list(
+    request: BatchURLRequest,
+    user_id: str,
+    on_result=None,
+    completed: Optional[dict] = None
+) -> tuple[list, list]:
+    """Fetch and analyze a batch of URLs concurrently.
+
+    Returns ``(results, failed_urls)`` in request order. If given,
+    ``await on_result(index, url, outcome)`` is called as each URL finishes,
+    with ``outcome`` either a URLAnalysisResponse or the exception raised.
+    ``completed`` maps indices that already finished to their outcome; those
+    URLs are not processed again.
+    """
+    completed = completed or {}
 
+    async def run(index: int, url: str):
+        if index in completed:
+            return completed[index]
+        try:
+            outcome = await analyze_batch_url(url, request, user_id)
+        except Exception as e:
+            outcome = e
+        if on_result:
+            await on_result(index, url, outcome)
+        return outcome
+
+    outcomes = await asyncio.gather(*[run(i, url) for i, url in enumerate(request.urls)])
+
+    results = []
+    failed_urls = []
+    for url, outcome in zip(request.urls, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"Error processing URL {url}: {outcome}")
+            failed_urls.append({
+                "url": url,
+                "error": str(outcome)
+            })
+        else:
+            results.append(outcome)
+    return results, failed_urls
+
+
+# Batch Result Storage
+# Batch rows and URL results are stored one document per result, written with
+# insert_many in flushes of this many documents; batch headers carry only counters
+BATCH_RESULT_FLUSH_SIZE = int(os.getenv("BATCH_RESULT_FLUSH_SIZE", "500"))
+
+async def store_batch_results(collection, batch_id: str, user_id: str, results: List[dict]):
+    """Insert a batch's results in order, tagged with batch_id and result_index"""
+    for start in range(0, len(results), BATCH_RESULT_FLUSH_SIZE):
+        await collection.insert_many([
+            {**result, "batch_id": batch_id, "result_index": start + i, "user_id": user_id}
+            for i, result in enumerate(results[start:start + BATCH_RESULT_FLUSH_SIZE])
+        ], ordered=False)
+
+# Bookkeeping fields added by store_batch_results, not part of a result
+BATCH_RESULT_STORAGE_FIELDS = {"batch_id", "result_index", "user_id"}
+
+async def read_batch_results(collection, batch_id: str, user_id: str, start: int, limit: int) -> List[dict]:
+    return await collection.find(
+        {"batch_id": batch_id, "user_id": user_id, "result_index": {"$gte": start, "$lt": start + limit}},
+        {"_id": 0}
+    ).sort("result_index", ASCENDING).to_list(None)
+
+# Analytics Rollups
+# Hourly and daily per-user counters, bumped with $inc whenever analyses are stored,
+# so dashboards read a handful of bucket documents instead of every analysis
+ROLLUP_GRANULARITIES = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+ROLLUP_MAX_BUCKETS = 1000
+
+def rollup_bucket_start(moment: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def rollup_key(name) -> str:
+    """Make a label safe to use as a Mongo field name"""
+    return str(name).strip().replace(".", "_").replace("$", "_")[:100] or "unknown"
+
+def build_rollup_increments(source: str, results: List[dict]) -> dict:
+    """Sum the $inc counters contributed by a set of stored analyses"""
+    increments = {}
+
+    def bump(field: str, amount=1):
+        increments[field] = increments.get(field, 0) + amount
+
+    for result in results:
+        bump("total")
+        bump(f"sources.{source}")
+        if result.get("sentiment"):
+            bump(f"sentiment.{rollup_key(result['sentiment'])}")
+        if result.get("dominant_emotion"):
+            bump(f"dominant_emotion.{rollup_key(result['dominant_emotion'])}")
+        for emotion, score in (result.get("emotions") or {}).items():
+            if isinstance(score, (int, float)):
+                bump(f"emotion_scores.{rollup_key(emotion)}", float(score))
+        if result.get("sarcasm_detected"):
+            bump("sarcasm_detected")
+        for topic in result.get("topics_detected") or []:
+            if isinstance(topic, dict) and topic.get("topic"):
+                bump(f"topics.{rollup_key(topic['topic'])}")
+        for aspect in result.get("aspects_analysis") or []:
+            if isinstance(aspect, dict) and aspect.get("aspect"):
+                bump(f"aspects.{rollup_key(aspect['aspect'])}.{rollup_key(aspect.get('sentiment', ''))}")
+    return increments
+
+async def record_analysis_rollups(user_id: str, source: str, results: List[dict]):
+    """Add stored analyses to the user's hourly and daily rollups; never fails the request"""
+    if not results:
+        return
+    try:
+        now = datetime.now(timezone.utc)
+        increments = build_rollup_increments(source, results)
+        await db.analytics_rollups.bulk_write([
+            UpdateOne(
+                {"user_id": user_id, "granularity": granularity, "bucket_start": rollup_bucket_start(now, granularity)},
+                {"$inc": increments},
+                upsert=True
+            )
+            for granularity in ROLLUP_GRANULARITIES
+        ], ordered=False)
+    except Exception as e:
+        logger.warning(f"Could not update analytics rollups for user {user_id}: {e}")
+
+def merge_rollup_counts(target: dict, counts: dict):
+    for key, value in counts.items():
+        if isinstance(value, dict):
+            merge_rollup_counts(target.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)):
+            target[key] = target.get(key, 0) + value
 
 # API Routes
 @api_router.get("/")
@@ -1298,18 +2619,25 @@ async def get_status_checks():
     status_checks = await db.status_checks.find().to_list(1000)
     return [StatusCheck(**status_check) for status_check in status_checks]
 
+@api_router.get("/status/extraction-pool")
+async def get_extraction_pool_status():
+    """Report extraction pool queue depth and worker utilization"""
+    return extraction_pool.stats()
+
 @api_router.post("/analyze-sentiment", response_model=SentimentResponse)
 async def analyze_text_sentiment(
     request: SentimentRequest,
     current_user = Depends(get_current_verified_user)
 ):
     """Analyze sentiment of provided text"""
+    reservation = None
     try:
         if not request.text.strip():
             raise HTTPException(status_code=400, detail="Text cannot be empty")
         
-        # Check usage limits
-        if not await check_usage_limits(current_user, "analyses_this_month"):
+        # Reserve usage before doing any work; unused units are refunded below
+        reservation = await reserve_usage(current_user, "analyses_this_month")
+        if reservation is None:
             raise HTTPException(
                 status_code=status.HTTP_402_PAYMENT_REQUIRED,
                 detail="Monthly analysis limit reached. Please upgrade your plan."
@@ -1343,9 +2671,10 @@ async def analyze_text_sentiment(
         response_dict['timestamp'] = response_dict['timestamp'].isoformat()
         response_dict['user_id'] = current_user["id"]
         await db.sentiment_analyses.insert_one(response_dict)
+        await record_analysis_rollups(current_user["id"], "text", [response_dict])
         
-        # Increment usage counter
-        await increment_usage(current_user["id"], "analyses_this_month")
+        # Consume the reserved usage unit
+        reservation.use()
         
         logger.info(f"Sentiment analysis completed for user {current_user['email']}: {request.text[:50]}...")
         return response
@@ -1355,6 +2684,9 @@ async def analyze_text_sentiment(
     except Exception as e:
         logger.error(f"Error in sentiment analysis endpoint: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        if reservation:
+            await reservation.settle()
 
 @api_router.get("/sentiment-history", response_model=List[SentimentAnalysis])
 async def get_sentiment_history(
@@ -1371,27 +2703,203 @@ async def get_sentiment_history(
         logger.error(f"Error fetching sentiment history: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+# Keyset-paginated history, newest first: pages are ordered by (timestamp, id) and
+# each cursor encodes the last key seen, so deep pages cost the same as the first
+HISTORY_MAX_LIMIT = 100
+
+def encode_history_cursor(timestamp: str, item_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([timestamp, item_id]).encode()).decode()
+
+def decode_history_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        timestamp, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(timestamp), str(item_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def fetch_history_page(
+    collection,
+    id_field: str,
+    model,
+    user_id: str,
+    limit: int,
+    cursor: Optional[str],
+    fields: Optional[str]
+) -> HistoryPage:
+    """Read one page of a user's history from ``collection`` (indexed on user_id, timestamp, id_field)"""
+    if not 1 <= limit <= HISTORY_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {HISTORY_MAX_LIMIT}")
+    
+    # Only known fields can be projected; the sort keys are always returned
+    projection = {"_id": 0, "user_id": 0}
+    if fields:
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested - set(model.__fields__)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {sorted(unknown)}")
+        projection = {field: 1 for field in requested | {"timestamp", id_field}}
+        projection["_id"] = 0
+    
+    query = {"user_id": user_id}
+    if cursor:
+        timestamp, item_id = decode_history_cursor(cursor)
+        query["$or"] = [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, id_field: {"$lt": item_id}}
+        ]
+    
+    # Fetch one extra item to know whether another page exists
+    items = await collection.find(query, projection).sort(
+        [("timestamp", DESCENDING), (id_field, DESCENDING)]
+    ).limit(limit + 1).to_list(limit + 1)
+    
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_history_cursor(items[-1]["timestamp"], items[-1][id_field])
+    return HistoryPage(items=items, next_cursor=next_cursor)
+
+@api_router.get("/history/sentiment", response_model=HistoryPage)
+async def get_sentiment_history_page(
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user = Depends(get_current_verified_user)
+):
+    """Page through the user's text analyses; ``fields`` is a comma-separated projection"""
+    try:
+        return await fetch_history_page(
+            db.sentiment_analyses, "id", SentimentAnalysis, current_user["id"], limit, cursor, fields
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching sentiment history page: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@api_router.get("/history/urls", response_model=HistoryPage)
+async def get_url_history_page(
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user = Depends(get_current_verified_user)
+):
+    """Page through the user's URL analyses; ``fields`` is a comma-separated projection"""
+    try:
+        return await fetch_history_page(
+            db.url_analyses, "id", URLAnalysisResponse, current_user["id"], limit, cursor, fields
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching URL history page: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@api_router.get("/history/batches", response_model=HistoryPage)
+async def get_batch_history_page(
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user = Depends(get_current_verified_user)
+):
+    """Page through the user's batch analyses; row results are paged per batch"""
+    try:
+        return await fetch_history_page(
+            db.batch_analyses, "batch_id", BatchAnalysisResponse, current_user["id"], limit, cursor, fields
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching batch history page: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@api_router.get("/analytics", response_model=AnalyticsResponse)
+async def get_analytics(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    granularity: str = "day",
+    current_user = Depends(get_current_verified_user)
+):
+    """Sentiment, emotion, topic and aspect distributions over a time window (default: last 30 days)"""
+    try:
+        if granularity not in ROLLUP_GRANULARITIES:
+            raise HTTPException(status_code=400, detail=f"granularity must be one of {list(ROLLUP_GRANULARITIES)}")
+        
+        end = end or datetime.now(timezone.utc)
+        start = start or end - timedelta(days=30)
+        # Naive datetimes are taken as UTC, which is what rollups are bucketed in
+        if end.tzinfo is None:
+            end = end.replace(tzinfo=timezone.utc)
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=timezone.utc)
+        if start >= end:
+            raise HTTPException(status_code=400, detail="start must be before end")
+        if (end - start) / ROLLUP_GRANULARITIES[granularity] > ROLLUP_MAX_BUCKETS:
+            raise HTTPException(status_code=400, detail="Time window too large for this granularity")
+        
+        buckets = await db.analytics_rollups.find(
+            {
+                "user_id": current_user["id"],
+                "granularity": granularity,
+                "bucket_start": {"$gte": rollup_bucket_start(start, granularity), "$lt": end}
+            },
+            {"_id": 0, "user_id": 0, "granularity": 0}
+        ).sort("bucket_start", ASCENDING).to_list(None)
+        
+        totals = {}
+        series = []
+        for bucket in buckets:
+            bucket_start = bucket.pop("bucket_start")
+            merge_rollup_counts(totals, bucket)
+            series.append({
+                "bucket_start": bucket_start,
+                "total": bucket.get("total", 0),
+                "sentiment": bucket.get("sentiment", {})
+            })
+        
+        total_analyses = totals.get("total", 0)
+        emotion_averages = {
+            emotion: round(score / total_analyses, 4)
+            for emotion, score in totals.get("emotion_scores", {}).items()
+        } if total_analyses else {}
+        
+        return AnalyticsResponse(
+            granularity=granularity,
+            start=start,
+            end=end,
+            total_analyses=total_analyses,
+            sentiment_distribution=totals.get("sentiment", {}),
+            dominant_emotion_distribution=totals.get("dominant_emotion", {}),
+            emotion_averages=emotion_averages,
+            topic_distribution=totals.get("topics", {}),
+            aspect_distribution=totals.get("aspects", {}),
+            sarcasm_detected=totals.get("sarcasm_detected", 0),
+            sources=totals.get("sources", {}),
+            series=series
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching analytics: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @api_router.post("/upload-file", response_model=FileUploadResponse)
 async def upload_file(
     file: UploadFile = File(...),
     current_user = Depends(get_current_verified_user)
 ):
     """Upload and parse file for batch sentiment analysis"""
+    reservation = None
+    spool = None
     try:
-        # Check usage limits
-        if not await check_usage_limits(current_user, "files_uploaded"):
+        # Reserve usage before doing any work; unused units are refunded below
+        reservation = await reserve_usage(current_user, "files_uploaded")
+        if reservation is None:
             raise HTTPException(
                 status_code=status.HTTP_402_PAYMENT_REQUIRED,
                 detail="Monthly file upload limit reached. Please upgrade your plan."
             )
-        # Validate file size (5MB limit)
-        MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB in bytes
-        file_size = len(await file.read())
-        await file.seek(0)  # Reset file pointer
-        
-        if file_size > MAX_FILE_SIZE:
-            raise HTTPException(status_code=413, detail="File size exceeds 5MB limit")
-        
         # Validate file type
         allowed_extensions = ['txt', 'csv', 'xlsx', 'xls', 'pdf']
         file_extension = file.filename.split('.')[-1].lower()
@@ -1399,35 +2907,44 @@ async def upload_file(
         if file_extension not in allowed_extensions:
             raise HTTPException(status_code=400, detail=f"File type '{file_extension}' not supported. Allowed types: {allowed_extensions}")
         
-        # Extract text from file
-        extracted_texts = await extract_text_from_file(file)
+        # Spool the upload to disk in chunks, rejecting it as soon as it passes the size limit
+        spool = await spool_upload(file)
         
-        if not extracted_texts:
-            raise HTTPException(status_code=400, detail="No text content could be extracted from the file")
-        
-        # Limit number of entries to prevent overwhelming the system
-        if len(extracted_texts) > 100:
-            extracted_texts = extracted_texts[:100]
-            logger.warning(f"File {file.filename} had {len(extracted_texts)} entries, limiting to 100")
-        
-        # Create response
+        # Store extracted rows chunk by chunk; the header is written last so a
+        # partially ingested file is never visible
         response = FileUploadResponse(
             filename=file.filename,
             file_type=file_extension,
-            total_entries=len(extracted_texts),
-            extracted_texts=extracted_texts
+            total_entries=0,
+            extracted_texts=[]
         )
         
-        # Store file metadata in database with user association
-        file_metadata = response.dict()
-        file_metadata['timestamp'] = file_metadata['timestamp'].isoformat()
-        file_metadata['user_id'] = current_user["id"]
-        await db.uploaded_files.insert_one(file_metadata)
+        try:
+            async for chunk in iter_extracted_text_chunks(file.filename, spool):
+                if not chunk:
+                    continue
+                await store_file_rows(response.file_id, response.total_entries, chunk)
+                response.total_entries += len(chunk)
+                # Only a preview is echoed back; the full set stays in storage
+                response.extracted_texts.extend(chunk[:UPLOAD_PREVIEW_ROWS - len(response.extracted_texts)])
+            response.truncated = len(response.extracted_texts) < response.total_entries
+            
+            if not response.total_entries:
+                raise HTTPException(status_code=400, detail="No text content could be extracted from the file")
+            
+            # Store the file header with user association
+            file_metadata = response.dict(exclude={"extracted_texts"})
+            file_metadata['timestamp'] = file_metadata['timestamp'].isoformat()
+            file_metadata['user_id'] = current_user["id"]
+            await db.uploaded_files.insert_one(file_metadata)
+        except Exception:
+            await delete_file_rows(response.file_id)
+            raise
         
-        # Increment usage counter
-        await increment_usage(current_user["id"], "files_uploaded")
+        # Consume the reserved usage unit
+        reservation.use()
         
-        logger.info(f"Successfully processed file {file.filename} for user {current_user['email']}: {len(extracted_texts)} texts extracted")
+        logger.info(f"Successfully processed file {file.filename} for user {current_user['email']}: {response.total_entries} texts extracted")
         return response
         
     except HTTPException:
@@ -1435,91 +2952,141 @@ async def upload_file(
     except Exception as e:
         logger.error(f"Error uploading file: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        if spool:
+            spool.close()
+        if reservation:
+            await reservation.settle()
 
-@api_router.post("/analyze-batch", response_model=BatchAnalysisResponse)
-async def analyze_batch(
-    request: BatchAnalysisRequest,
+async def select_batch_rows(file_metadata: dict, request: BatchAnalysisRequest) -> List[dict]:
+    """Read the stored rows a batch request refers to, in file order"""
+    if "extracted_texts" in file_metadata:
+        # Files uploaded before rows moved to their own collection
+        rows = file_metadata["extracted_texts"] or []
+        if request.row_numbers is not None:
+            wanted = set(request.row_numbers)
+            rows = [entry for entry in rows if entry.get("row_number") in wanted]
+        end = None if request.limit is None else request.start + request.limit
+        return rows[request.start:end]
+    
+    return await read_file_rows(request.file_id, request.start, request.limit, request.row_numbers)
+
+@api_router.get("/files/{file_id}/rows", response_model=List[dict])
+async def get_file_rows(
+    file_id: str,
+    start: int = 0,
+    limit: int = 100,
     current_user = Depends(get_current_verified_user)
 ):
-    """Perform batch sentiment analysis on extracted texts"""
+    """Get a range of extracted rows of an uploaded file"""
     try:
-        if not request.texts:
-            raise HTTPException(status_code=400, detail="No texts provided for analysis")
-        
-        # Get file metadata (ensure it belongs to the current user)
-        file_metadata = await db.uploaded_files.find_one({
-            "file_id": request.file_id,
-            "user_id": current_user["id"]
-        })
+        if start < 0 or not 1 <= limit <= 1000:
+            raise HTTPException(status_code=400, detail="start must be >= 0 and limit between 1 and 1000")
+        
+        file_metadata = await db.uploaded_files.find_one(
+            {"file_id": file_id, "user_id": current_user["id"]},
+            {"extracted_texts": {"$slice": [start, limit]}}
+        )
         if not file_metadata:
             raise HTTPException(status_code=404, detail="File not found")
         
-        results = []
-        processed_count = 0
-        
-        for text_entry in request.texts:
-            try:
-                text_content = text_entry.get("text", "")
-                if not text_content.strip():
-                    continue
-                
-                # Perform sentiment analysis
-                analysis_result = await analyze_sentiment(text_content)
-                
-                # Create result with metadata
-                result = {
-                    "id": str(uuid.uuid4()),
-                    "text": text_content,
-                    "row_number": text_entry.get("row_number"),
-                    "metadata": text_entry.get("metadata", {}),
-                    "sentiment": analysis_result["sentiment"],
-                    "confidence": analysis_result["confidence"],
-                    "analysis": analysis_result["analysis"],
-                    "emotions": analysis_result.get("emotions", {}),
-                    "dominant_emotion": analysis_result.get("dominant_emotion", ""),
-                    "sarcasm_detected": analysis_result.get("sarcasm_detected", False),
-                    "sarcasm_confidence": analysis_result.get("sarcasm_confidence", 0.0),
-                    "sarcasm_explanation": analysis_result.get("sarcasm_explanation", ""),
-                    "adjusted_sentiment": analysis_result.get("adjusted_sentiment", analysis_result["sentiment"]),
-                    "sarcasm_indicators": analysis_result.get("sarcasm_indicators", []),
-                    "topics_detected": analysis_result.get("topics_detected", []),
-                    "primary_topic": analysis_result.get("primary_topic", ""),
-                    "topic_summary": analysis_result.get("topic_summary", ""),
-                    "aspects_analysis": analysis_result.get("aspects_analysis", []),
-                    "aspects_summary": analysis_result.get("aspects_summary", ""),
-                    "timestamp": datetime.now(timezone.utc).isoformat()
-                }
-                
-                results.append(result)
-                processed_count += 1
-                
-            except Exception as e:
-                logger.error(f"Error analyzing text entry {text_entry.get('row_number', 'unknown')}: {e}")
-                # Continue processing other entries
-                continue
+        if "extracted_texts" in file_metadata:
+            return file_metadata["extracted_texts"]
+        return await read_file_rows(file_id, start, limit)
         
-        # Create batch response
-        batch_response = BatchAnalysisResponse(
-            file_id=request.file_id,
-            filename=file_metadata.get("filename", "unknown"),
-            total_processed=processed_count,
-            results=results
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching rows of file {file_id}: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+async def prepare_batch_analysis(
+    request: BatchAnalysisRequest,
+    current_user: dict
+) -> tuple[dict, List[dict], UsageReservation]:
+    """Validate a batch request and reserve its usage; returns (file_metadata, rows, reservation)"""
+    # Get file metadata (ensure it belongs to the current user)
+    file_metadata = await db.uploaded_files.find_one({
+        "file_id": request.file_id,
+        "user_id": current_user["id"]
+    })
+    if not file_metadata:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    rows = await select_batch_rows(file_metadata, request)
+    if not rows:
+        raise HTTPException(status_code=400, detail="No texts selected for analysis")
+    
+    # Reserve one analysis per non-empty row; rows that fail are refunded
+    rows_to_analyze = sum(
+        1 for entry in rows
+        if isinstance(entry.get("text"), str) and entry["text"].strip()
+    )
+    reservation = await reserve_usage(current_user, "analyses_this_month", rows_to_analyze)
+    if reservation is None:
+        remaining = await get_remaining_usage(current_user, "analyses_this_month")
+        raise HTTPException(
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            detail=f"This batch would exceed your monthly analysis limit. You can analyze {remaining} more texts this month."
         )
-        
-        # Store batch results in database with user association
-        batch_data = batch_response.dict()
-        batch_data['timestamp'] = batch_data['timestamp'].isoformat()
-        batch_data['user_id'] = current_user["id"]
-        await db.batch_analyses.insert_one(batch_data)
-        
-        logger.info(f"Batch analysis completed: {processed_count} texts processed")
-        return batch_response
+    
+    return file_metadata, rows, reservation
+
+async def execute_batch_analysis(
+    request: BatchAnalysisRequest,
+    current_user: dict,
+    file_metadata: dict,
+    rows: List[dict],
+    reservation: UsageReservation,
+    on_result=None,
+    completed: Optional[dict] = None
+) -> BatchAnalysisResponse:
+    """Analyze and store a prepared batch; the caller settles the reservation"""
+    # Analyze rows concurrently in token-budgeted packs, keeping row order
+    results = await analyze_batch_entries(rows, current_user["id"], on_result, completed)
+    processed_count = len(results)
+    
+    # Create batch response
+    batch_response = BatchAnalysisResponse(
+        file_id=request.file_id,
+        filename=file_metadata.get("filename", "unknown"),
+        total_processed=processed_count,
+        results=results
+    )
+    
+    # Store each row result, then a header with just the counters
+    await store_batch_results(db.batch_analysis_results, batch_response.batch_id, current_user["id"], results)
+    await record_analysis_rollups(current_user["id"], "batch", results)
+    batch_data = batch_response.dict(exclude={"results"})
+    batch_data['timestamp'] = batch_data['timestamp'].isoformat()
+    batch_data['user_id'] = current_user["id"]
+    await db.batch_analyses.insert_one(batch_data)
+    
+    # Consume usage for the rows that were analyzed
+    reservation.use(processed_count)
+    
+    logger.info(f"Batch analysis completed: {processed_count} texts processed")
+    return batch_response
+
+@api_router.post("/analyze-batch", response_model=BatchAnalysisResponse)
+async def analyze_batch(
+    request: BatchAnalysisRequest,
+    current_user = Depends(get_current_verified_user)
+):
+    """Perform batch sentiment analysis on extracted texts"""
+    reservation = None
+    try:
+        file_metadata, rows, reservation = await prepare_batch_analysis(request, current_user)
+        return await execute_batch_analysis(request, current_user, file_metadata, rows, reservation)
         
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error in batch analysis: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        if reservation:
+            await reservation.settle()
 
 @api_router.post("/analyze-url", response_model=URLAnalysisResponse)
 async def analyze_url(
@@ -1527,9 +3094,11 @@ async def analyze_url(
     current_user = Depends(get_current_verified_user)
 ):
     """Analyze sentiment of content from a single URL"""
+    reservation = None
     try:
-        # Check usage limits
-        if not await check_usage_limits(current_user, "urls_analyzed"):
+        # Reserve usage before doing any work; unused units are refunded below
+        reservation = await reserve_usage(current_user, "urls_analyzed")
+        if reservation is None:
             raise HTTPException(
                 status_code=status.HTTP_402_PAYMENT_REQUIRED,
                 detail="Monthly URL analysis limit reached. Please upgrade your plan."
@@ -1542,43 +3111,20 @@ async def analyze_url(
         )
         
         # Perform sentiment analysis on extracted text
-        analysis_result = await analyze_sentiment(url_data['extracted_text'])
+        analysis_result = await analyze_url_content(url_data)
         
         # Create response
-        response = URLAnalysisResponse(
-            url=url_data['url'],
-            title=url_data.get('title'),
-            author=url_data.get('author'),
-            publish_date=url_data.get('publish_date'),
-            extracted_text=url_data['extracted_text'],
-            text_length=url_data['text_length'],
-            sentiment=analysis_result["sentiment"],
-            confidence=analysis_result["confidence"],
-            analysis=analysis_result["analysis"],
-            emotions=analysis_result.get("emotions", {}),
-            dominant_emotion=analysis_result.get("dominant_emotion", ""),
-            sarcasm_detected=analysis_result.get("sarcasm_detected", False),
-            sarcasm_confidence=analysis_result.get("sarcasm_confidence", 0.0),
-            sarcasm_explanation=analysis_result.get("sarcasm_explanation", ""),
-            adjusted_sentiment=analysis_result.get("adjusted_sentiment", analysis_result["sentiment"]),
-            sarcasm_indicators=analysis_result.get("sarcasm_indicators", []),
-            topics_detected=analysis_result.get("topics_detected", []),
-            primary_topic=analysis_result.get("primary_topic", ""),
-            topic_summary=analysis_result.get("topic_summary", ""),
-            aspects_analysis=analysis_result.get("aspects_analysis", []),
-            aspects_summary=analysis_result.get("aspects_summary", ""),
-            metadata=url_data.get('metadata', {}),
-            processing_time=url_data.get('processing_time', 0.0)
-        )
+        response = build_url_analysis_response(url_data, analysis_result)
         
         # Store URL analysis in database with user association
         url_analysis_data = response.dict()
         url_analysis_data['timestamp'] = url_analysis_data['timestamp'].isoformat()
         url_analysis_data['user_id'] = current_user["id"]
         await db.url_analyses.insert_one(url_analysis_data)
+        await record_analysis_rollups(current_user["id"], "url", [url_analysis_data])
         
-        # Increment usage counter
-        await increment_usage(current_user["id"], "urls_analyzed")
+        # Consume the reserved usage unit
+        reservation.use()
         
         logger.info(f"Successfully analyzed URL for user {current_user['email']}: {request.url[:100]}...")
         return response
@@ -1588,6 +3134,78 @@ async def analyze_url(
     except Exception as e:
         logger.error(f"Error analyzing URL {request.url}: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        if reservation:
+            await reservation.settle()
+
+async def prepare_batch_url_analysis(request: BatchURLRequest, current_user: dict) -> UsageReservation:
+    """Validate a batch URL request and reserve usage for every URL"""
+    if not request.urls:
+        raise HTTPException(status_code=400, detail="No URLs provided for analysis")
+    
+    if len(request.urls) > 20:  # Limit batch size
+        raise HTTPException(status_code=400, detail="Maximum 20 URLs allowed per batch")
+    
+    # Reserve usage for every URL up front (count each URL toward the limit)
+    reservation = await reserve_usage(current_user, "urls_analyzed", len(request.urls))
+    if reservation is None:
+        remaining = await get_remaining_usage(current_user, "urls_analyzed")
+        raise HTTPException(
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            detail=f"This batch would exceed your monthly URL limit. You can analyze {remaining} more URLs this month."
+        )
+    return reservation
+
+async def execute_batch_url_analysis(
+    request: BatchURLRequest,
+    current_user: dict,
+    reservation: UsageReservation,
+    start_time: float,
+    on_result=None,
+    completed: Optional[dict] = None
+) -> BatchURLResponse:
+    """Analyze and store a prepared URL batch; the caller settles the reservation"""
+    # Fetch and analyze URLs concurrently; outcomes come back in request order
+    results, failed_urls = await analyze_batch_url_list(request, current_user["id"], on_result, completed)
+    
+    total_processing_time = time.time() - start_time
+    
+    # Create batch response
+    batch_response = BatchURLResponse(
+        total_requested=len(request.urls),
+        total_processed=len(results),
+        total_failed=len(failed_urls),
+        results=results,
+        failed_urls=failed_urls,
+        processing_time=total_processing_time
+    )
+    
+    # Consume usage for successful URLs; failed ones are refunded
+    reservation.use(len(results))
+    
+    # Store each URL result in the URL analysis history
+    url_results = []
+    for url_response in results:
+        url_analysis_data = url_response.dict()
+        url_analysis_data['timestamp'] = url_analysis_data['timestamp'].isoformat()
+        url_results.append(url_analysis_data)
+    await store_batch_results(db.url_analyses, batch_response.batch_id, current_user["id"], url_results)
+    await record_analysis_rollups(current_user["id"], "url", url_results)
+    
+    # Store batch metadata with user association
+    batch_data = {
+        "batch_id": batch_response.batch_id,
+        "total_requested": batch_response.total_requested,
+        "total_processed": batch_response.total_processed,
+        "total_failed": batch_response.total_failed,
+        "processing_time": batch_response.processing_time,
+        "user_id": current_user["id"],
+        "timestamp": batch_response.timestamp.isoformat()
+    }
+    await db.url_batch_analyses.insert_one(batch_data)
+    
+    logger.info(f"Batch URL analysis completed for user {current_user['email']}: {len(results)}/{len(request.urls)} URLs processed successfully")
+    return batch_response
 
 @api_router.post("/analyze-batch-urls", response_model=BatchURLResponse)
 async def analyze_batch_urls(
@@ -1596,119 +3214,509 @@ async def analyze_batch_urls(
 ):
     """Analyze sentiment of content from multiple URLs"""
     start_time = time.time()
+    reservation = None
     
     try:
-        # Check usage limits (count each URL toward the limit)
-        urls_to_analyze = len(request.urls)
-        current_usage = current_user.get("usage_stats", {}).get("urls_analyzed", 0)
-        subscription_tier = current_user.get("subscription_tier", "free")
-        limit = 10 if subscription_tier == "free" else 5000
-        
-        if current_usage + urls_to_analyze > limit:
-            raise HTTPException(
-                status_code=status.HTTP_402_PAYMENT_REQUIRED,
-                detail=f"This batch would exceed your monthly URL limit. You can analyze {limit - current_usage} more URLs this month."
-            )
-        if not request.urls:
-            raise HTTPException(status_code=400, detail="No URLs provided for analysis")
-        
-        if len(request.urls) > 20:  # Limit batch size
-            raise HTTPException(status_code=400, detail="Maximum 20 URLs allowed per batch")
-        
-        results = []
-        failed_urls = []
+        reservation = await prepare_batch_url_analysis(request, current_user)
+        return await execute_batch_url_analysis(request, current_user, reservation, start_time)
         
-        for url in request.urls:
-            try:
-                # Process URL and extract content
-                url_data = await url_processor.process_url(
-                    url, 
-                    request.extract_full_content, 
-                    request.include_metadata
-                )
-                
-                # Perform sentiment analysis
-                analysis_result = await analyze_sentiment(url_data['extracted_text'])
-                
-                # Create URL analysis response
-                url_response = URLAnalysisResponse(
-                    url=url_data['url'],
-                    title=url_data.get('title'),
-                    author=url_data.get('author'),
-                    publish_date=url_data.get('publish_date'),
-                    extracted_text=url_data['extracted_text'],
-                    text_length=url_data['text_length'],
-                    sentiment=analysis_result["sentiment"],
-                    confidence=analysis_result["confidence"],
-                    analysis=analysis_result["analysis"],
-                    emotions=analysis_result.get("emotions", {}),
-                    dominant_emotion=analysis_result.get("dominant_emotion", ""),
-                    sarcasm_detected=analysis_result.get("sarcasm_detected", False),
-                    sarcasm_confidence=analysis_result.get("sarcasm_confidence", 0.0),
-                    sarcasm_explanation=analysis_result.get("sarcasm_explanation", ""),
-                    adjusted_sentiment=analysis_result.get("adjusted_sentiment", analysis_result["sentiment"]),
-                    sarcasm_indicators=analysis_result.get("sarcasm_indicators", []),
-                    topics_detected=analysis_result.get("topics_detected", []),
-                    primary_topic=analysis_result.get("primary_topic", ""),
-                    topic_summary=analysis_result.get("topic_summary", ""),
-                    aspects_analysis=analysis_result.get("aspects_analysis", []),
-                    aspects_summary=analysis_result.get("aspects_summary", ""),
-                    metadata=url_data.get('metadata', {}),
-                    processing_time=url_data.get('processing_time', 0.0)
-                )
-                
-                results.append(url_response)
-                
-                # Store in database with user association
-                url_analysis_data = url_response.dict()
-                url_analysis_data['timestamp'] = url_analysis_data['timestamp'].isoformat()
-                url_analysis_data['user_id'] = current_user["id"]
-                await db.url_analyses.insert_one(url_analysis_data)
-                
-            except Exception as e:
-                logger.error(f"Error processing URL {url}: {e}")
-                failed_urls.append({
-                    "url": url,
-                    "error": str(e)
-                })
-                continue
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in batch URL analysis: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        if reservation:
+            await reservation.settle()
+
+@api_router.get("/batch-analyses/{batch_id}/results", response_model=List[dict])
+async def get_batch_analysis_results(
+    batch_id: str,
+    start: int = 0,
+    limit: int = 100,
+    current_user = Depends(get_current_verified_user)
+):
+    """Get a page of the row results of a batch analysis"""
+    try:
+        if start < 0 or not 1 <= limit <= 1000:
+            raise HTTPException(status_code=400, detail="start must be >= 0 and limit between 1 and 1000")
+        return await read_batch_results(db.batch_analysis_results, batch_id, current_user["id"], start, limit)
         
-        total_processing_time = time.time() - start_time
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching results of batch {batch_id}: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@api_router.get("/url-batch-analyses/{batch_id}/results", response_model=List[dict])
+async def get_batch_url_analysis_results(
+    batch_id: str,
+    start: int = 0,
+    limit: int = 100,
+    current_user = Depends(get_current_verified_user)
+):
+    """Get a page of the URL results of a batch URL analysis"""
+    try:
+        if start < 0 or not 1 <= limit <= 1000:
+            raise HTTPException(status_code=400, detail="start must be >= 0 and limit between 1 and 1000")
+        return await read_batch_results(db.url_analyses, batch_id, current_user["id"], start, limit)
         
-        # Create batch response
-        batch_response = BatchURLResponse(
-            total_requested=len(request.urls),
-            total_processed=len(results),
-            total_failed=len(failed_urls),
-            results=results,
-            failed_urls=failed_urls,
-            processing_time=total_processing_time
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching results of URL batch {batch_id}: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+# Background Batch Jobs
+# Running jobs touch updated_at every heartbeat; jobs silent for longer than the
+# stale window (e.g. after a crash or deploy) are claimed and resumed
+BATCH_JOB_HEARTBEAT_SECONDS = int(os.getenv("BATCH_JOB_HEARTBEAT_SECONDS", "30"))
+BATCH_JOB_STALE_SECONDS = int(os.getenv("BATCH_JOB_STALE_SECONDS", "120"))
+
+BATCH_JOB_OPERATIONS = {"texts": "analyses_this_month", "urls": "urls_analyzed"}
+# Where a completed job's results are stored, and the response they are rebuilt into
+BATCH_JOB_RESULT_SOURCES = {
+    "texts": ("batch_analysis_results", BatchAnalysisResponse),
+    "urls": ("url_analyses", BatchURLResponse),
+}
+
+batch_job_tasks = set()  # Strong references so running jobs are not garbage collected
+
+def start_batch_job(coro):
+    """Run a batch job in the background of this process"""
+    task = asyncio.create_task(coro)
+    batch_job_tasks.add(task)
+    task.add_done_callback(batch_job_tasks.discard)
+
+async def create_batch_job(job_type: str, user_id: str, total_items: int, request: BaseModel) -> dict:
+    """Insert a queued job document, including everything needed to resume it"""
+    now = datetime.now(timezone.utc)
+    job = {
+        "job_id": str(uuid.uuid4()),
+        "job_type": job_type,
+        "user_id": user_id,
+        "status": "queued",
+        "total_items": total_items,
+        "completed_items": 0,
+        "failed_items": 0,
+        "lease_id": str(uuid.uuid4()),  # Owner token; replaced whenever the job is claimed for resume
+        "batch_id": None,
+        "result": None,
+        "error": None,
+        "request": request.dict(),
+        "reserved_units": total_items,
+        "usage_settled": False,
+        "created_at": now,
+        "updated_at": now
+    }
+    await db.batch_jobs.insert_one(job)
+    return job
+
+async def update_batch_job(job_id: str, update: dict, lease_id: Optional[str] = None) -> bool:
+    """Apply ``update`` to a job; with ``lease_id``, only while that lease still owns it"""
+    update.setdefault("$set", {})["updated_at"] = datetime.now(timezone.utc)
+    query = {"job_id": job_id}
+    if lease_id is not None:
+        query["lease_id"] = lease_id
+    result = await db.batch_jobs.update_one(query, update)
+    return result.matched_count > 0
+
+async def checkpoint_batch_item(job_id: str, item_index: int, item_status: str, result=None, error: Optional[str] = None):
+    """Persist one finished item so a resumed job never repeats it"""
+    await db.batch_job_items.update_one(
+        {"job_id": job_id, "item_index": item_index},
+        {"$set": {
+            "status": item_status,
+            "result": result,
+            "error": error,
+            "completed_at": datetime.now(timezone.utc)
+        }},
+        upsert=True
+    )
+
+async def load_batch_checkpoints(job_id: str) -> List[dict]:
+    return await db.batch_job_items.find({"job_id": job_id}).to_list(None)
+
+async def read_batch_job_items(job_id: str, item_status: str, start: int = 0, limit: Optional[int] = None) -> List[dict]:
+    """Read the results of a job's checkpointed items with ``item_status``, in item order"""
+    index_range = {"$gte": start} if limit is None else {"$gte": start, "$lt": start + limit}
+    items = await db.batch_job_items.find(
+        {"job_id": job_id, "status": item_status, "item_index": index_range},
+        {"_id": 0, "result": 1}
+    ).sort("item_index", ASCENDING).to_list(None)
+    return [item["result"] for item in items if item.get("result") is not None]
+
+async def settle_batch_job_usage(job_id: str, lease_id: str, reservation: UsageReservation):
+    """Refund a job's unused units exactly once, and only while holding its lease"""
+    # Flag first so a competing worker can never refund the same units again
+    claimed = await db.batch_jobs.find_one_and_update(
+        {"job_id": job_id, "lease_id": lease_id, "usage_settled": False},
+        {"$set": {"usage_settled": True, "updated_at": datetime.now(timezone.utc)}}
+    )
+    if claimed is not None:
+        await reservation.settle()
+
+async def batch_job_heartbeat(job_id: str, lease_id: str, worker: asyncio.Task, lease_lost: asyncio.Event):
+    """Keep a running job's updated_at fresh so other workers do not claim it.
+
+    A failed heartbeat is retried on the next beat; if another worker has
+    claimed the job in the meantime, ``lease_lost`` is set and the worker
+    task is cancelled so the job never runs twice.
+    """
+    while True:
+        await asyncio.sleep(BATCH_JOB_HEARTBEAT_SECONDS)
+        try:
+            owned = await update_batch_job(job_id, {}, lease_id)
+        except Exception as e:
+            logger.warning(f"Heartbeat failed for batch job {job_id}: {e}")
+            continue
+        if not owned:
+            logger.warning(f"Batch job {job_id} was claimed by another worker; stopping this run")
+            lease_lost.set()
+            worker.cancel()
+            return
+
+async def run_leased_batch_job(job_id: str, lease_id: str, reservation: UsageReservation, work):
+    """Run ``await work()`` for a job while heartbeating its lease, then record the outcome"""
+    lease_lost = asyncio.Event()
+    heartbeat = asyncio.create_task(
+        batch_job_heartbeat(job_id, lease_id, asyncio.current_task(), lease_lost)
+    )
+    try:
+        await update_batch_job(job_id, {"$set": {"status": "running"}}, lease_id)
+        batch_response = await work()
+        await update_batch_job(job_id, {"$set": {
+            "status": "completed",
+            "batch_id": batch_response.batch_id,
+            "result": batch_response.dict(exclude={"results"})
+        }}, lease_id)
+    except asyncio.CancelledError:
+        # Either way the job is unfinished and keeps its reservation: after a lost
+        # lease the new owner settles it, after a shutdown the sweeper resumes it
+        if not lease_lost.is_set():
+            raise
+        return
+    except Exception as e:
+        logger.error(f"Batch job {job_id} failed: {e}")
+        await update_batch_job(job_id, {"$set": {"status": "failed", "error": str(e)}}, lease_id)
+    finally:
+        heartbeat.cancel()
+
+    # Only a completed or failed job refunds its unused units
+    await settle_batch_job_usage(job_id, lease_id, reservation)
+
+async def run_batch_analysis_job(
+    job_id: str,
+    lease_id: str,
+    request: BatchAnalysisRequest,
+    current_user: dict,
+    file_metadata: dict,
+    rows: List[dict],
+    reservation: UsageReservation,
+    completed: Optional[dict] = None
+):
+    """Background worker for /analyze-batch/jobs"""
+    async def record_row(row_index: int, result: Optional[dict]):
+        # Results live in batch_job_items; the job document only keeps counters
+        if result is None:
+            await checkpoint_batch_item(job_id, row_index, "failed")
+            await update_batch_job(job_id, {"$inc": {"failed_items": 1}}, lease_id)
+        else:
+            await checkpoint_batch_item(job_id, row_index, "completed", result=result)
+            await update_batch_job(job_id, {"$inc": {"completed_items": 1}}, lease_id)
+
+    await run_leased_batch_job(job_id, lease_id, reservation, lambda: execute_batch_analysis(
+        request, current_user, file_metadata, rows, reservation, on_result=record_row, completed=completed
+    ))
+
+async def run_batch_url_analysis_job(
+    job_id: str,
+    lease_id: str,
+    request: BatchURLRequest,
+    current_user: dict,
+    reservation: UsageReservation,
+    completed: Optional[dict] = None
+):
+    """Background worker for /analyze-batch-urls/jobs"""
+    async def record_url(index: int, url: str, outcome):
+        # Results live in batch_job_items; the job document only keeps counters
+        if isinstance(outcome, Exception):
+            await checkpoint_batch_item(
+                job_id, index, "failed", result={"url": url, "error": str(outcome)}, error=str(outcome)
+            )
+            await update_batch_job(job_id, {"$inc": {"failed_items": 1}}, lease_id)
+        else:
+            await checkpoint_batch_item(job_id, index, "completed", result=outcome.dict())
+            await update_batch_job(job_id, {"$inc": {"completed_items": 1}}, lease_id)
+
+    await run_leased_batch_job(job_id, lease_id, reservation, lambda: execute_batch_url_analysis(
+        request, current_user, reservation, time.time(), on_result=record_url, completed=completed
+    ))
+
+async def resume_batch_job(job: dict):
+    """Restart an interrupted job from its checkpoints under the lease it was claimed with"""
+    job_id = job["job_id"]
+    lease_id = job["lease_id"]
+    checkpoints = await load_batch_checkpoints(job_id)
+    user = await get_user_by_id(job["user_id"])
+    if not user:
+        await update_batch_job(job_id, {"$set": {"status": "failed", "error": "User not found"}}, lease_id)
+        return
+
+    # usage_settled guards the refund, so a settled job is never refunded twice
+    reservation = UsageReservation(user["id"], BATCH_JOB_OPERATIONS[job["job_type"]], job["reserved_units"])
+
+    logger.info(f"Resuming batch job {job_id} with {len(checkpoints)}/{job['total_items']} items checkpointed")
+
+    if job["job_type"] == "texts":
+        request = BatchAnalysisRequest(**job["request"])
+        file_metadata = await db.uploaded_files.find_one({"file_id": request.file_id, "user_id": user["id"]})
+        if not file_metadata:
+            await update_batch_job(job_id, {"$set": {"status": "failed", "error": "File not found"}}, lease_id)
+            await settle_batch_job_usage(job_id, lease_id, reservation)
+            return
+        completed = {item["item_index"]: item["result"] for item in checkpoints}
+        rows = await select_batch_rows(file_metadata, request)
+        start_batch_job(run_batch_analysis_job(job_id, lease_id, request, user, file_metadata, rows, reservation, completed))
+    else:
+        request = BatchURLRequest(**job["request"])
+        completed = {
+            item["item_index"]: (
+                URLAnalysisResponse(**item["result"]) if item["status"] == "completed"
+                else Exception(item.get("error") or "Unknown error")
+            )
+            for item in checkpoints
+        }
+        start_batch_job(run_batch_url_analysis_job(job_id, lease_id, request, user, reservation, completed))
+
+async def claim_stale_batch_jobs() -> int:
+    """Atomically claim and resume jobs whose worker stopped heartbeating"""
+    claimed = 0
+    while True:
+        stale_before = datetime.now(timezone.utc) - timedelta(seconds=BATCH_JOB_STALE_SECONDS)
+        job = await db.batch_jobs.find_one_and_update(
+            {"status": {"$in": ["queued", "running"]}, "updated_at": {"$lt": stale_before}},
+            {
+                "$set": {"status": "running", "lease_id": str(uuid.uuid4()), "updated_at": datetime.now(timezone.utc)},
+                "$inc": {"resume_count": 1}
+            },
+            return_document=ReturnDocument.AFTER
         )
+        if job is None:
+            return claimed
+        claimed += 1
+        try:
+            await resume_batch_job(job)
+        except Exception as e:
+            logger.error(f"Could not resume batch job {job['job_id']}: {e}")
+            await update_batch_job(job["job_id"], {"$set": {"status": "failed", "error": str(e)}}, job["lease_id"])
+
+async def batch_job_sweeper():
+    """Periodically resume batch jobs interrupted by a crash or deploy"""
+    while True:
+        try:
+            await claim_stale_batch_jobs()
+        except Exception as e:
+            logger.warning(f"Batch job sweep failed: {e}")
+        await asyncio.sleep(BATCH_JOB_HEARTBEAT_SECONDS)
+
+@api_router.post("/analyze-batch/jobs", response_model=BatchJobSubmitResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_batch_job(
+    request: BatchAnalysisRequest,
+    current_user = Depends(get_current_verified_user)
+):
+    """Queue a batch sentiment analysis and return its job id immediately"""
+    reservation = None
+    try:
+        file_metadata, rows, reservation = await prepare_batch_analysis(request, current_user)
+        job = await create_batch_job("texts", current_user["id"], reservation.amount, request)
+        start_batch_job(run_batch_analysis_job(
+            job["job_id"], job["lease_id"], request, current_user, file_metadata, rows, reservation
+        ))
+        return BatchJobSubmitResponse(**job)
         
-        # Increment usage counter for successful URLs
-        await increment_usage(current_user["id"], "urls_analyzed", len(results))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error submitting batch job: {e}")
+        if reservation:
+            await reservation.settle()
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@api_router.post("/analyze-batch-urls/jobs", response_model=BatchJobSubmitResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_batch_url_job(
+    request: BatchURLRequest,
+    current_user = Depends(get_current_verified_user)
+):
+    """Queue a batch URL analysis and return its job id immediately"""
+    reservation = None
+    try:
+        reservation = await prepare_batch_url_analysis(request, current_user)
+        job = await create_batch_job("urls", current_user["id"], len(request.urls), request)
+        start_batch_job(run_batch_url_analysis_job(job["job_id"], job["lease_id"], request, current_user, reservation))
+        return BatchJobSubmitResponse(**job)
         
-        # Store batch metadata with user association
-        batch_data = {
-            "batch_id": batch_response.batch_id,
-            "total_requested": batch_response.total_requested,
-            "total_processed": batch_response.total_processed,
-            "total_failed": batch_response.total_failed,
-            "processing_time": batch_response.processing_time,
-            "user_id": current_user["id"],
-            "timestamp": batch_response.timestamp.isoformat()
-        }
-        await db.url_batch_analyses.insert_one(batch_data)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error submitting batch URL job: {e}")
+        if reservation:
+            await reservation.settle()
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@api_router.get("/batch-jobs/{job_id}", response_model=BatchJobStatus)
+async def get_batch_job(
+    job_id: str,
+    include_partial_results: bool = True,
+    start: int = 0,
+    limit: int = 100,
+    current_user = Depends(get_current_verified_user)
+):
+    """Get progress, a page of finished items and (once finished) the batch response of a job.
+
+    ``start``/``limit`` select the page of finished items by item index and,
+    for a completed job, the page of ``result["results"]``.
+    """
+    try:
+        if start < 0 or not 1 <= limit <= 1000:
+            raise HTTPException(status_code=400, detail="start must be >= 0 and limit between 1 and 1000")
+        
+        job = await db.batch_jobs.find_one({"job_id": job_id, "user_id": current_user["id"]}, {"request": 0})
+        if not job:
+            raise HTTPException(status_code=404, detail="Batch job not found")
         
-        logger.info(f"Batch URL analysis completed for user {current_user['email']}: {len(results)}/{len(request.urls)} URLs processed successfully")
-        return batch_response
+        job_status = BatchJobStatus(**job)
+        if job_status.result is not None and job_status.batch_id:
+            # The job document keeps only the summary; results are read back a page at a time
+            collection_name, response_model = BATCH_JOB_RESULT_SOURCES[job["job_type"]]
+            results = await read_batch_results(
+                getattr(db, collection_name), job_status.batch_id, current_user["id"], start, limit
+            )
+            job_status.result = response_model(**{**job_status.result, "results": [
+                {key: value for key, value in result.items() if key not in BATCH_RESULT_STORAGE_FIELDS}
+                for result in results
+            ]}).dict()
+        if include_partial_results:
+            job_status.partial_results = await read_batch_job_items(job_id, "completed", start, limit)
+        if job["job_type"] == "urls":
+            # At most one entry per URL of the batch
+            job_status.failed_urls = await read_batch_job_items(job_id, "failed")
+        return job_status
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in batch URL analysis: {e}")
+        logger.error(f"Error fetching batch job {job_id}: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+# Streaming Batch Results
+def format_sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+def start_batch_stream(run, reservation: UsageReservation) -> asyncio.Queue:
+    """Start ``run(emit)`` in the background and return the queue its SSE events go to.
+
+    Called from the endpoint, before the response body is iterated, so the
+    reservation is settled even if the client disconnects before streaming
+    starts. The batch keeps running without a client so that finished
+    analyses are still stored and usage is settled exactly once.
+    """
+    events = asyncio.Queue()
+
+    async def emit(event: str, data):
+        await events.put(format_sse_event(event, data))
+
+    async def worker():
+        try:
+            summary = await run(emit)
+            await emit("summary", summary)
+        except HTTPException as e:
+            await emit("error", {"detail": e.detail})
+        except Exception as e:
+            logger.error(f"Error in streamed batch: {e}")
+            await emit("error", {"detail": "Internal server error"})
+        finally:
+            await reservation.settle()
+            await events.put(None)
+
+    start_batch_job(worker())
+    return events
+
+async def drain_batch_events(events: asyncio.Queue):
+    """Yield queued SSE events until the batch worker signals the end"""
+    while True:
+        event = await events.get()
+        if event is None:
+            return
+        yield event
+
+@api_router.post("/analyze-batch/stream")
+async def stream_batch_analysis(
+    request: BatchAnalysisRequest,
+    current_user = Depends(get_current_verified_user)
+):
+    """Batch sentiment analysis streamed as Server-Sent Events.
+
+    Emits a ``result`` event per row as it completes (``failed`` for rows
+    that could not be analyzed), then a ``summary`` event with the batch
+    totals and no per-row results.
+    """
+    file_metadata, rows, reservation = await prepare_batch_analysis(request, current_user)
+
+    async def run(emit):
+        async def on_row(row_index: int, result: Optional[dict]):
+            if result is None:
+                await emit("failed", {"row_index": row_index})
+            else:
+                await emit("result", {"row_index": row_index, **result})
+
+        batch_response = await execute_batch_analysis(
+            request, current_user, file_metadata, rows, reservation, on_result=on_row
+        )
+        return batch_response.dict(exclude={"results"})
+
+    # Started here rather than on first iteration so the reservation is always settled
+    events = start_batch_stream(run, reservation)
+    return StreamingResponse(
+        drain_batch_events(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.post("/analyze-batch-urls/stream")
+async def stream_batch_url_analysis(
+    request: BatchURLRequest,
+    current_user = Depends(get_current_verified_user)
+):
+    """Batch URL analysis streamed as Server-Sent Events.
+
+    Emits a ``result`` event with the URLAnalysisResponse of each URL as it
+    completes (``failed`` with the error otherwise), then a ``summary`` event
+    with the batch totals and failed URLs.
+    """
+    start_time = time.time()
+    reservation = await prepare_batch_url_analysis(request, current_user)
+
+    async def run(emit):
+        async def on_url(index: int, url: str, outcome):
+            if isinstance(outcome, Exception):
+                await emit("failed", {"index": index, "url": url, "error": str(outcome)})
+            else:
+                await emit("result", {"index": index, **outcome.dict()})
+
+        batch_response = await execute_batch_url_analysis(
+            request, current_user, reservation, start_time, on_result=on_url
+        )
+        return batch_response.dict(exclude={"results"})
+
+    # Started here rather than on first iteration so the reservation is always settled
+    events = start_batch_stream(run, reservation)
+    return StreamingResponse(
+        drain_batch_events(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Authentication Router
 auth_router = APIRouter(prefix="/auth", tags=["authentication"])
 
@@ -1753,6 +3761,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
         {"id": user["id"]},
         {"$set": {"last_login": datetime.now(timezone.utc)}}
     )
+    user_cache.invalidate(user_id=user["id"], email=user["email"])
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -1824,6 +3833,7 @@ async def verify_email(token: str):
             {"id": user_id},
             {"$set": {"is_verified": True}}
         )
+        user_cache.invalidate(user_id=user_id, email=user["email"])
         
         return {"message": "Email verified successfully. Your account is now fully active."}
         
@@ -1904,7 +3914,7 @@ async def reset_password(request: PasswordReset):
             )
         
         # Update password
-        hashed_password = hash_password(request.new_password)
+        hashed_password = await hash_password(request.new_password)
         await db.users.update_one(
             {"id": user_id},
             {"$set": {
@@ -1912,6 +3922,7 @@ async def reset_password(request: PasswordReset):
                 "updated_at": datetime.now(timezone.utc)
             }}
         )
+        user_cache.invalidate(user_id=user_id, email=user["email"])
         
         return {"message": "Password reset successfully. Please log in with your new password."}
         
@@ -1956,13 +3967,13 @@ async def update_profile(
         
         if update_data.new_password and update_data.current_password:
             # Verify current password
-            if not verify_password(update_data.current_password, current_user["hashed_password"]):
+            if not await verify_password(update_data.current_password, current_user["hashed_password"]):
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Current password is incorrect"
                 )
             
-            update_fields["hashed_password"] = hash_password(update_data.new_password)
+            update_fields["hashed_password"] = await hash_password(update_data.new_password)
         
         if update_fields:
             update_fields["updated_at"] = datetime.now(timezone.utc)
@@ -1970,6 +3981,7 @@ async def update_profile(
                 {"id": current_user["id"]},
                 {"$set": update_fields}
             )
+            user_cache.invalidate(user_id=current_user["id"], email=current_user["email"])
         
         return {"message": "Profile updated successfully"}
         
@@ -2002,6 +4014,104 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Database Indexes
+# (collection, keys, options) for every hot query; create_index is idempotent
+MONGO_INDEXES = [
+    ("users", [("email", ASCENDING)], {"unique": True}),
+    ("users", [("id", ASCENDING)], {"unique": True}),
+    ("sentiment_analyses", [("user_id", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)], {}),
+    ("url_analyses", [("user_id", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)], {}),
+    ("batch_analyses", [("user_id", ASCENDING), ("timestamp", DESCENDING), ("batch_id", DESCENDING)], {}),
+    ("url_batch_analyses", [("user_id", ASCENDING), ("timestamp", DESCENDING)], {}),
+    ("batch_analysis_results", [("batch_id", ASCENDING), ("result_index", ASCENDING)], {"unique": True}),
+    ("analytics_rollups", [("user_id", ASCENDING), ("granularity", ASCENDING), ("bucket_start", ASCENDING)], {"unique": True}),
+    ("url_analyses", [("batch_id", ASCENDING), ("result_index", ASCENDING)], {"sparse": True}),
+    ("uploaded_files", [("file_id", ASCENDING), ("user_id", ASCENDING)], {}),
+    ("uploaded_file_rows", [("file_id", ASCENDING), ("row_index", ASCENDING)], {"unique": True}),
+    ("batch_jobs", [("job_id", ASCENDING), ("user_id", ASCENDING)], {"unique": True}),
+    ("batch_jobs", [("status", ASCENDING), ("updated_at", ASCENDING)], {}),
+    ("batch_job_items", [("job_id", ASCENDING), ("item_index", ASCENDING)], {"unique": True}),
+]
+
+# Representative (collection, filter, sort) queries whose plans are checked after bootstrap
+MONGO_INDEX_PROBES = [
+    ("users", {"email": ""}, None),
+    ("users", {"id": ""}, None),
+    ("sentiment_analyses", {"user_id": ""}, [("timestamp", DESCENDING), ("id", DESCENDING)]),
+    ("url_analyses", {"user_id": ""}, [("timestamp", DESCENDING), ("id", DESCENDING)]),
+    ("batch_analyses", {"user_id": ""}, [("timestamp", DESCENDING), ("batch_id", DESCENDING)]),
+    ("batch_analysis_results", {"batch_id": "", "user_id": "", "result_index": {"$gte": 0}}, [("result_index", ASCENDING)]),
+    ("analytics_rollups", {"user_id": "", "granularity": "day"}, [("bucket_start", ASCENDING)]),
+    ("uploaded_files", {"file_id": "", "user_id": ""}, None),
+    ("uploaded_file_rows", {"file_id": ""}, [("row_index", ASCENDING)]),
+]
+
+def plan_uses_collscan(plan) -> bool:
+    """Whether any stage of an explain() plan is a collection scan"""
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(plan_uses_collscan(value) for value in plan.values())
+    if isinstance(plan, list):
+        return any(plan_uses_collscan(value) for value in plan)
+    return False
+
+async def ensure_database_indexes() -> List[str]:
+    """Create the indexes in MONGO_INDEXES and return collections still planned as COLLSCAN"""
+    for collection_name, keys, options in MONGO_INDEXES:
+        try:
+            await db[collection_name].create_index(keys, **options)
+        except Exception as e:
+            logger.error(f"Could not create index {keys} on {collection_name}: {e}")
+
+    collscan_collections = []
+    for collection_name, query, sort in MONGO_INDEX_PROBES:
+        try:
+            cursor = db[collection_name].find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            explanation = await cursor.explain()
+        except Exception as e:
+            logger.warning(f"Could not explain query {query} on {collection_name}: {e}")
+            continue
+        if plan_uses_collscan(explanation.get("queryPlanner", {}).get("winningPlan", {})):
+            collscan_collections.append(collection_name)
+    return collscan_collections
+
+@app.on_event("startup")
+async def init_database_indexes():
+    collscan_collections = await ensure_database_indexes()
+    for collection_name in collscan_collections:
+        logger.warning(f"Queries on {collection_name} still fall back to COLLSCAN")
+
+@app.on_event("startup")
+async def init_caches():
+    for cache in (sentiment_cache, url_content_cache):
+        try:
+            await cache.ensure_indexes()
+        except Exception as e:
+            logger.warning(f"Could not create cache indexes for {cache.collection.name}: {e}")
+
+@app.on_event("startup")
+async def start_batch_job_sweeper():
+    app.state.batch_job_sweeper = asyncio.create_task(batch_job_sweeper())
+
+@app.on_event("shutdown")
+async def stop_batch_job_sweeper():
+    app.state.batch_job_sweeper.cancel()
+
+@app.on_event("shutdown")
+async def shutdown_http_client():
+    await url_processor.close()
+
+@app.on_event("shutdown")
+async def shutdown_extraction_pool():
+    extraction_pool.shutdown()
+
+@app.on_event("shutdown")
+async def shutdown_password_executor():
+    password_executor.shutdown(wait=False)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
\ No newline at end of file
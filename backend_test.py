@@ -2183,8 +2183,12 @@ startxref
             print(f"❌ Invalid file_id format: {response_data['file_id']}")
             return False
         
-        # Validate total_entries matches extracted_texts length
-        if response_data['total_entries'] != len(response_data['extracted_texts']):
+        # Validate total_entries against extracted_texts, which is only a preview when truncated
+        if response_data.get('truncated'):
+            if len(response_data['extracted_texts']) >= response_data['total_entries']:
+                print(f"❌ truncated preview has {len(response_data['extracted_texts'])} of {response_data['total_entries']} entries")
+                return False
+        elif response_data['total_entries'] != len(response_data['extracted_texts']):
             print(f"❌ total_entries mismatch: {response_data['total_entries']} vs {len(response_data['extracted_texts'])}")
             return False
         
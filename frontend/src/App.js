@@ -1328,8 +1328,7 @@ const AppContent = () => {
     setBatchLoading(true);
     try {
       const response = await axios.post(`${API}/analyze-batch`, {
-        file_id: uploadedFile.file_id,
-        texts: uploadedFile.extracted_texts
+        file_id: uploadedFile.file_id
       });
 
       setBatchResults(response.data);
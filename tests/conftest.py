@@ -0,0 +1,181 @@
+"""Shared setup for unit tests of backend/server.py.
+
+These tests exercise pure logic and never talk to a real MongoDB: collections
+the code under test touches are replaced with the in-memory FakeCollection.
+"""
+import copy
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# Motor connects lazily, so importing the server never opens a connection
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "pulse_point_unit_tests")
+
+
+def _get_path(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return None, False
+        doc = doc[part]
+    return doc, True
+
+
+def _set_path(doc, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _matches_condition(value, exists, condition):
+    if not isinstance(condition, dict) or not any(key.startswith("$") for key in condition):
+        return exists and value == condition
+    for operator, operand in condition.items():
+        if operator == "$exists":
+            if exists != operand:
+                return False
+        elif operator == "$in":
+            if not exists or value not in operand:
+                return False
+        elif not exists:
+            return False
+        elif operator == "$lt" and not value < operand:
+            return False
+        elif operator == "$lte" and not value <= operand:
+            return False
+        elif operator == "$gt" and not value > operand:
+            return False
+        elif operator == "$gte" and not value >= operand:
+            return False
+    return True
+
+
+def matches(doc, query):
+    """Evaluate the subset of Mongo query syntax the server uses"""
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, clause) for clause in condition):
+                return False
+        elif not _matches_condition(*_get_path(doc, key), condition):
+            return False
+    return True
+
+
+def project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    included = {key for key, value in projection.items() if value and key != "_id"}
+    if included:
+        result = {key: copy.deepcopy(doc[key]) for key in included if key in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    return {key: copy.deepcopy(value) for key, value in doc.items() if projection.get(key, 1)}
+
+
+class UpdateResult:
+    def __init__(self, matched_count):
+        self.matched_count = matched_count
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self._docs = docs
+        self._skip = 0
+        self._limit = None
+
+    def sort(self, key_or_list, direction=None):
+        keys = key_or_list if isinstance(key_or_list, list) else [(key_or_list, direction)]
+        for key, key_direction in reversed(keys):
+            self._docs.sort(key=lambda doc: _get_path(doc, key)[0], reverse=key_direction < 0)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    async def to_list(self, length=None):
+        docs = self._docs[self._skip:]
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        return docs
+
+
+class FakeCollection:
+    """In-memory stand-in for the Motor collection methods the server calls"""
+
+    def __init__(self, docs=None):
+        self.docs = [copy.deepcopy(doc) for doc in docs or []]
+
+    def _apply(self, doc, update):
+        for path, value in update.get("$set", {}).items():
+            _set_path(doc, path, value)
+        for path, amount in update.get("$inc", {}).items():
+            current, _ = _get_path(doc, path)
+            _set_path(doc, path, (current or 0) + amount)
+
+    def _upsert(self, query, update):
+        doc = {key: value for key, value in query.items() if not key.startswith("$") and not isinstance(value, dict)}
+        self._apply(doc, update)
+        self.docs.append(doc)
+        return doc
+
+    async def create_index(self, *args, **kwargs):
+        return None
+
+    async def find_one(self, query, projection=None):
+        for doc in self.docs:
+            if matches(doc, query):
+                return project(doc, projection)
+        return None
+
+    def find(self, query, projection=None):
+        return FakeCursor([project(doc, projection) for doc in self.docs if matches(doc, query)])
+
+    async def insert_one(self, doc):
+        self.docs.append(copy.deepcopy(doc))
+
+    async def insert_many(self, docs, ordered=True):
+        self.docs.extend(copy.deepcopy(doc) for doc in docs)
+
+    async def update_one(self, query, update, upsert=False):
+        for doc in self.docs:
+            if matches(doc, query):
+                self._apply(doc, update)
+                return UpdateResult(1)
+        if upsert:
+            self._upsert(query, update)
+        return UpdateResult(0)
+
+    async def replace_one(self, query, replacement, upsert=False):
+        for i, doc in enumerate(self.docs):
+            if matches(doc, query):
+                self.docs[i] = copy.deepcopy(replacement)
+                return UpdateResult(1)
+        if upsert:
+            self.docs.append(copy.deepcopy(replacement))
+        return UpdateResult(0)
+
+    async def find_one_and_update(self, query, update, projection=None, upsert=False, return_document=False):
+        for doc in self.docs:
+            if matches(doc, query):
+                before = copy.deepcopy(doc)
+                self._apply(doc, update)
+                return project(doc if return_document else before, projection)
+        if upsert:
+            return project(self._upsert(query, update), projection) if return_document else None
+        return None
+
+
+@pytest.fixture
+def fake_collection():
+    return FakeCollection
@@ -0,0 +1,107 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import server
+from server import UsageReservation, get_batch_job, run_leased_batch_job, store_batch_results
+
+
+@pytest.fixture
+def fake_db(monkeypatch, fake_collection):
+    db = SimpleNamespace(
+        users=fake_collection([{"id": "u1", "usage_stats": {"analyses_this_month": 40}}]),
+        batch_jobs=fake_collection([{
+            "job_id": "job-1", "job_type": "texts", "user_id": "u1", "lease_id": "lease-1", "status": "queued",
+            "total_items": 40, "usage_settled": False, "batch_id": None, "result": None,
+            "created_at": "2026-01-01T00:00:00+00:00", "updated_at": "2026-01-01T00:00:00+00:00"
+        }]),
+        batch_job_items=fake_collection(),
+        batch_analysis_results=fake_collection(),
+    )
+    monkeypatch.setattr(server, "db", db)
+    return db
+
+
+def usage(db):
+    return db.users.docs[0]["usage_stats"]["analyses_this_month"]
+
+
+def job(db):
+    return db.batch_jobs.docs[0]
+
+
+def make_reservation():
+    return UsageReservation("u1", "analyses_this_month", 40)
+
+
+def test_cancelled_job_keeps_its_reservation(fake_db):
+    reservation = make_reservation()
+    started = asyncio.Event()
+
+    async def work():
+        started.set()
+        await asyncio.Event().wait()
+
+    async def run():
+        task = asyncio.create_task(run_leased_batch_job("job-1", "lease-1", reservation, work))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert usage(fake_db) == 40
+    assert job(fake_db)["usage_settled"] is False
+    assert job(fake_db)["status"] == "running"
+
+
+def test_completed_job_refunds_unused_units(fake_db):
+    reservation = make_reservation()
+
+    async def work():
+        reservation.use(30)
+        return server.BatchAnalysisResponse(
+            file_id="f", filename="reviews.csv", total_processed=30, results=[]
+        )
+
+    asyncio.run(run_leased_batch_job("job-1", "lease-1", reservation, work))
+    assert usage(fake_db) == 30
+    assert job(fake_db)["usage_settled"] is True
+    assert job(fake_db)["status"] == "completed"
+
+
+def test_failed_job_refunds_unused_units(fake_db):
+    reservation = make_reservation()
+
+    async def work():
+        reservation.use(5)
+        raise RuntimeError("boom")
+
+    asyncio.run(run_leased_batch_job("job-1", "lease-1", reservation, work))
+    assert usage(fake_db) == 5
+    assert job(fake_db)["usage_settled"] is True
+    assert job(fake_db)["status"] == "failed"
+
+
+def test_completed_job_returns_a_page_of_the_batch_response(fake_db):
+    reservation = make_reservation()
+    rows = [{"id": f"r{i}", "text": f"text {i}", "row_number": i + 2, "sentiment": "positive"} for i in range(5)]
+
+    async def work():
+        reservation.use(len(rows))
+        response = server.BatchAnalysisResponse(
+            file_id="f", filename="reviews.csv", total_processed=len(rows), results=rows
+        )
+        await store_batch_results(fake_db.batch_analysis_results, response.batch_id, "u1", rows)
+        return response
+
+    async def run():
+        await run_leased_batch_job("job-1", "lease-1", reservation, work)
+        return await get_batch_job("job-1", include_partial_results=False, start=1, limit=2, current_user={"id": "u1"})
+
+    job_status = asyncio.run(run())
+    assert "results" not in job(fake_db)["result"]
+    assert job_status.result["batch_id"] == job_status.batch_id
+    assert job_status.result["total_processed"] == 5
+    assert job_status.result["results"] == rows[1:3]
@@ -0,0 +1,30 @@
+import io
+
+import openpyxl
+
+from server import iter_xlsx_rows
+
+
+def make_workbook(sheets):
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for title, rows in sheets.items():
+        sheet = workbook.create_sheet(title)
+        for row in rows:
+            sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def test_xlsx_row_numbers_are_unique_across_sheets():
+    workbook = make_workbook({
+        "S1": [("review", "stars"), ("great product", 5), ("bad product", 1)],
+        "S2": [("comment",), ("so so",)],
+    })
+    entries = [entry for chunk in iter_xlsx_rows(workbook) for entry in chunk]
+
+    assert [entry["row_number"] for entry in entries] == ["S1!2", "S1!3", "S2!2"]
+    assert [entry["text"] for entry in entries] == ["great product", "bad product", "so so"]
+    assert entries[0]["metadata"] == {"stars": "5", "sheet_name": "S1"}
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from server import SentimentAnalysis, decode_history_cursor, encode_history_cursor, fetch_history_page
+
+
+def make_docs():
+    docs = [
+        {"id": f"a{i:02d}", "user_id": "u1", "text": f"text {i}", "sentiment": "positive",
+         "timestamp": f"2026-01-{i % 5 + 1:02d}T00:00:00+00:00"}
+        for i in range(23)
+    ]
+    docs.append({"id": "b00", "user_id": "u2", "text": "other user", "sentiment": "neutral",
+                 "timestamp": "2026-01-03T00:00:00+00:00"})
+    return docs
+
+
+def fetch(collection, limit=5, cursor=None, fields=None, user_id="u1"):
+    return asyncio.run(fetch_history_page(collection, "id", SentimentAnalysis, user_id, limit, cursor, fields))
+
+
+def test_cursor_roundtrip():
+    cursor = encode_history_cursor("2026-01-01T00:00:00+00:00", "abc")
+    assert decode_history_cursor(cursor) == ("2026-01-01T00:00:00+00:00", "abc")
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", encode_history_cursor("t", "i")[:-4], "WzFd"])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_history_cursor(cursor)
+    assert exc_info.value.status_code == 400
+
+
+def test_pages_cover_every_item_once_newest_first(fake_collection):
+    collection = fake_collection(make_docs())
+    seen = []
+    cursor = None
+    while True:
+        page = fetch(collection, cursor=cursor)
+        assert len(page.items) <= 5
+        seen.extend(page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    keys = [(item["timestamp"], item["id"]) for item in seen]
+    assert len(keys) == 23
+    assert keys == sorted(keys, reverse=True)
+    assert all(item["id"].startswith("a") for item in seen)
+
+
+def test_last_full_page_has_no_cursor(fake_collection):
+    collection = fake_collection(make_docs()[:5])
+    assert fetch(collection, limit=5).next_cursor is None
+    assert fetch(collection, limit=4).next_cursor is not None
+
+
+def test_items_hide_storage_fields(fake_collection):
+    page = fetch(fake_collection([{**make_docs()[0], "_id": "mongo"}]))
+    assert "_id" not in page.items[0]
+    assert "user_id" not in page.items[0]
+
+
+def test_fields_projection_keeps_sort_keys(fake_collection):
+    page = fetch(fake_collection(make_docs()), fields="sentiment")
+    assert set(page.items[0]) == {"sentiment", "timestamp", "id"}
+    assert fetch(fake_collection(make_docs()), cursor=page.next_cursor, fields="sentiment").items
+
+
+def test_unknown_field_is_rejected(fake_collection):
+    with pytest.raises(HTTPException) as exc_info:
+        fetch(fake_collection(make_docs()), fields="sentiment,password_hash")
+    assert exc_info.value.status_code == 400
+
+
+@pytest.mark.parametrize("limit", [0, 101])
+def test_limit_out_of_range_is_rejected(fake_collection, limit):
+    with pytest.raises(HTTPException) as exc_info:
+        fetch(fake_collection(make_docs()), limit=limit)
+    assert exc_info.value.status_code == 400
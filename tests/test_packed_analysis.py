@@ -0,0 +1,121 @@
+import asyncio
+import json
+
+import pytest
+
+import server
+from server import (
+    PACKED_ANALYSIS_MAX_ITEMS,
+    PACKED_ANALYSIS_MAX_TEXT_TOKENS,
+    PACKED_ANALYSIS_TOKEN_BUDGET,
+    SentimentCache,
+    estimate_tokens,
+    is_complete_sentiment_result,
+    is_valid_packed_item,
+    normalize_sentiment_result,
+    plan_packed_batches,
+)
+
+
+def make_result(sentiment="positive"):
+    return normalize_sentiment_result({"sentiment": sentiment, "confidence": 0.9, "analysis": "ok"})
+
+
+@pytest.fixture
+def cache(monkeypatch, fake_collection):
+    cache = SentimentCache(fake_collection(), max_size=100, ttl_seconds=60, prompt_version="test")
+    monkeypatch.setattr(server, "sentiment_cache", cache)
+    return cache
+
+
+def test_plan_covers_every_index_exactly_once():
+    texts = ["short text"] * 23 + ["x" * 4 * PACKED_ANALYSIS_MAX_TEXT_TOKENS * 2] + ["y" * 600] * 7
+    packs = plan_packed_batches(texts)
+    assert sorted(i for pack in packs for i in pack) == list(range(len(texts)))
+    assert all(pack == sorted(pack) for pack in packs)
+
+
+def test_plan_respects_item_cap():
+    packs = plan_packed_batches(["short text"] * (PACKED_ANALYSIS_MAX_ITEMS * 2 + 1))
+    assert [len(pack) for pack in packs] == [PACKED_ANALYSIS_MAX_ITEMS, PACKED_ANALYSIS_MAX_ITEMS, 1]
+
+
+def test_plan_respects_token_budget():
+    texts = ["y" * 4 * (PACKED_ANALYSIS_MAX_TEXT_TOKENS - 1)] * 20
+    for pack in plan_packed_batches(texts):
+        assert sum(estimate_tokens(texts[i]) for i in pack) <= PACKED_ANALYSIS_TOKEN_BUDGET
+
+
+def test_plan_gives_long_texts_their_own_pack():
+    long_text = "x" * 4 * (PACKED_ANALYSIS_MAX_TEXT_TOKENS + 1)
+    assert plan_packed_batches(["a", long_text, "b"]) == [[1], [0, 2]]
+
+
+def test_plan_of_nothing_is_empty():
+    assert plan_packed_batches([]) == []
+
+
+@pytest.mark.parametrize("item", [
+    {"index": 0, "sentiment": "positive", "confidence": 0.9},
+    {"index": 0, "sentiment": "positive", "confidence": True, "analysis": "ok"},
+    {"index": 0, "sentiment": "great", "confidence": 0.9, "analysis": "ok"},
+    {"index": "0", "sentiment": "positive", "confidence": 0.9, "analysis": "ok"},
+    "positive",
+])
+def test_invalid_packed_items_are_rejected(item):
+    assert not is_valid_packed_item(item)
+
+
+def test_valid_packed_item_is_accepted():
+    assert is_valid_packed_item({"index": 2, "sentiment": "neutral", "confidence": 1, "analysis": ""})
+
+
+def test_complete_result_requires_every_field():
+    result = make_result()
+    assert is_complete_sentiment_result(result)
+
+    del result["analysis"]
+    assert not is_complete_sentiment_result(result)
+    assert not is_complete_sentiment_result({**make_result(), "sarcasm_indicators": "x"})
+    assert not is_complete_sentiment_result(None)
+
+
+def test_incomplete_mongo_entry_is_a_cache_miss(cache):
+    cache.collection.docs.append({"_id": cache.make_key("text"), "result": {"sentiment": "positive"}})
+    assert asyncio.run(cache.get("text")) is None
+    assert cache.misses == 1
+
+
+def test_packed_analysis_keeps_only_complete_items(monkeypatch, cache):
+    async def fake_completion(texts):
+        return json.dumps([
+            {"index": 0, "sentiment": "positive", "confidence": 0.9, "analysis": "ok"},
+            {"index": 1, "sentiment": "negative", "confidence": 0.8, "analysis": "bad", "sarcasm_indicators": "x"},
+        ])
+
+    monkeypatch.setattr(server, "request_packed_sentiment_completion", fake_completion)
+    results = asyncio.run(server.analyze_sentiment_packed(["good", "odd", "missing"]))
+
+    assert results[0]["sentiment"] == "positive"
+    assert results[1:] == [None, None]
+    assert [doc["_id"] for doc in cache.collection.docs] == [cache.make_key("good")]
+
+
+def test_batch_pack_reruns_rows_missing_from_packed_response(monkeypatch, cache):
+    async def fake_completion(texts):
+        return json.dumps([{"index": 1, "sentiment": "negative", "confidence": 0.8, "analysis": "bad"}])
+
+    rerun = []
+
+    async def fake_analyze_sentiment(text):
+        rerun.append(text)
+        return make_result("neutral")
+
+    monkeypatch.setattr(server, "request_packed_sentiment_completion", fake_completion)
+    monkeypatch.setattr(server, "analyze_sentiment", fake_analyze_sentiment)
+    entries = [{"text": text, "row_number": i + 2} for i, text in enumerate(["a", "b", "c"])]
+    results = asyncio.run(server.analyze_batch_pack(entries, "user-1"))
+
+    assert [result["sentiment"] for result in results] == ["neutral", "negative", "neutral"]
+    assert [result["row_number"] for result in results] == [2, 3, 4]
+    assert sorted(rerun) == ["a", "c"]
@@ -0,0 +1,63 @@
+import asyncio
+
+from server import SentimentCache, normalize_sentiment_result
+
+
+def make_result(sentiment="positive"):
+    return normalize_sentiment_result({"sentiment": sentiment, "confidence": 0.9, "analysis": "ok"})
+
+
+def make_cache(collection, max_size=10, prompt_version="v1"):
+    return SentimentCache(collection, max_size=max_size, ttl_seconds=60, prompt_version=prompt_version)
+
+
+def test_key_ignores_whitespace_and_unicode_form(fake_collection):
+    cache = make_cache(fake_collection())
+    assert cache.make_key("great  product\n") == cache.make_key(" great product")
+    assert cache.make_key("café") == cache.make_key("café")
+
+
+def test_key_depends_on_text_and_prompt_version(fake_collection):
+    cache = make_cache(fake_collection())
+    assert cache.make_key("great product") != cache.make_key("bad product")
+    assert cache.make_key("great product") != make_cache(fake_collection(), prompt_version="v2").make_key("great product")
+
+
+def test_memory_tier_evicts_least_recently_used(fake_collection):
+    cache = make_cache(fake_collection(), max_size=2)
+
+    async def run():
+        await cache.set("a", make_result())
+        await cache.set("b", make_result())
+        await cache.get("a")
+        await cache.set("c", make_result())
+
+    asyncio.run(run())
+    assert list(cache._entries) == [cache.make_key("a"), cache.make_key("c")]
+
+
+def test_miss_falls_back_to_mongo_and_warms_memory(fake_collection):
+    collection = fake_collection()
+    result = make_result("negative")
+    asyncio.run(make_cache(collection).set("shared text", result))
+
+    cache = make_cache(collection)
+    assert asyncio.run(cache.get("shared  text")) == result
+    assert cache.make_key("shared text") in cache._entries
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_unknown_text_counts_a_miss(fake_collection):
+    cache = make_cache(fake_collection())
+    assert asyncio.run(cache.get("never seen")) is None
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+def test_get_returns_a_copy(fake_collection):
+    cache = make_cache(fake_collection())
+    asyncio.run(cache.set("text", make_result()))
+
+    first = asyncio.run(cache.get("text"))
+    first["emotions"]["joy"] = 1.0
+    first["sentiment"] = "negative"
+    assert asyncio.run(cache.get("text")) == make_result()
@@ -0,0 +1,104 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import server
+from server import USAGE_LIMITS, UsageReservation, reserve_usage, settle_batch_job_usage
+
+LIMIT = USAGE_LIMITS["free"]["analyses_this_month"]
+
+
+@pytest.fixture
+def fake_db(monkeypatch, fake_collection):
+    db = SimpleNamespace(
+        users=fake_collection([
+            {"id": "u1", "subscription_tier": "free", "usage_stats": {"analyses_this_month": 10}},
+            {"id": "u2", "subscription_tier": "free", "usage_stats": {}},
+        ]),
+        batch_jobs=fake_collection([{"job_id": "job-1", "lease_id": "lease-1", "usage_settled": False}]),
+    )
+    monkeypatch.setattr(server, "db", db)
+    return db
+
+
+def usage(db, user_id="u1"):
+    user = next(doc for doc in db.users.docs if doc["id"] == user_id)
+    return user["usage_stats"].get("analyses_this_month")
+
+
+def reserve(user_id, amount, tier="free"):
+    return asyncio.run(reserve_usage({"id": user_id, "subscription_tier": tier}, "analyses_this_month", amount))
+
+
+def test_reserve_within_limit_increments_usage(fake_db):
+    reservation = reserve("u1", 5)
+    assert (reservation.amount, reservation.used) == (5, 0)
+    assert usage(fake_db) == 15
+
+
+def test_reserve_up_to_exact_limit(fake_db):
+    assert reserve("u1", LIMIT - 10) is not None
+    assert usage(fake_db) == LIMIT
+
+
+def test_reserve_over_limit_leaves_usage_unchanged(fake_db):
+    assert reserve("u1", LIMIT - 9) is None
+    assert usage(fake_db) == 10
+
+
+def test_reserve_more_than_tier_limit_is_refused(fake_db):
+    assert reserve("u2", LIMIT + 1) is None
+    assert usage(fake_db, "u2") is None
+
+
+def test_reserve_without_usage_field(fake_db):
+    assert reserve("u2", 3) is not None
+    assert usage(fake_db, "u2") == 3
+
+
+def test_settle_refunds_unused_units(fake_db):
+    reservation = reserve("u1", 5)
+    reservation.use(2)
+    asyncio.run(reservation.settle())
+    assert usage(fake_db) == 12
+
+
+def test_settle_twice_refunds_once(fake_db):
+    reservation = reserve("u1", 5)
+    asyncio.run(reservation.settle())
+    asyncio.run(reservation.settle())
+    assert usage(fake_db) == 10
+
+
+def test_fully_used_reservation_refunds_nothing(fake_db):
+    reservation = reserve("u1", 5)
+    reservation.use(5)
+    asyncio.run(reservation.settle())
+    assert usage(fake_db) == 15
+
+
+def test_use_never_exceeds_reserved_amount():
+    reservation = UsageReservation("u1", "analyses_this_month", 3)
+    reservation.use(2)
+    reservation.use(2)
+    assert reservation.used == 3
+
+
+def test_batch_job_settles_once_across_workers(fake_db):
+    reservation = reserve("u1", 5)
+    reservation.use(1)
+    # A resumed worker rebuilds its own reservation for the same units
+    resumed = UsageReservation("u1", "analyses_this_month", 5)
+    resumed.used = 1
+
+    asyncio.run(settle_batch_job_usage("job-1", "lease-1", reservation))
+    asyncio.run(settle_batch_job_usage("job-1", "lease-1", resumed))
+    assert usage(fake_db) == 11
+
+
+def test_batch_job_without_lease_does_not_refund(fake_db):
+    reservation = reserve("u1", 5)
+    asyncio.run(settle_batch_job_usage("job-1", "stale-lease", reservation))
+    assert usage(fake_db) == 15
+    assert fake_db.batch_jobs.docs[0]["usage_settled"] is False